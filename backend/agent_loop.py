@@ -0,0 +1,114 @@
+import time
+import threading
+from contextlib import contextmanager
+
+class AgentTurn:
+    """
+    Budget and per-hop timing for one customer turn of the agent loop.
+    The model is offered tools until `max_hops` tool rounds have run, less
+    than `answer_time` seconds of the `deadline` are left or `token_budget`
+    prompt tokens have been sent; after that it is asked to answer with what
+    it has. A tool round's model call ends in time for that answer and no
+    model call runs past the deadline.
+    """
+
+    def __init__(self, max_hops=4, deadline=45.0, token_budget=16000, answer_time=10.0):
+        self.max_hops = max_hops
+        self.deadline = deadline
+        self.token_budget = token_budget
+        self.answer_time = answer_time
+
+        self.started = time.monotonic()
+        self.tool_rounds = 0
+        self.model_calls = 0
+        self.tokens = 0
+        self.hops = []
+        self.stopped_by = None
+
+    def exhausted(self):
+        """Name of the budget that ran out, or None"""
+        if self.tool_rounds >= self.max_hops:
+            return "hops"
+        if self.remaining(keep_answer_time=True) <= 0:
+            return "deadline"
+        if self.tokens >= self.token_budget:
+            return "tokens"
+        return None
+
+    def remaining(self, keep_answer_time=False):
+        """Seconds left before the turn's deadline, less the time kept for the final answer if asked"""
+        left = self.deadline - (time.monotonic() - self.started)
+        return max(0.0, left - self.answer_time if keep_answer_time else left)
+
+    def can_use_tools(self):
+        reason = self.exhausted()
+        if reason and self.tool_rounds:
+            self.stopped_by = reason
+        return reason is None
+
+    def spend(self, tokens):
+        self.tokens += tokens
+
+    @contextmanager
+    def hop(self, kind):
+        """Time one step of the loop, a model call or a round of tool calls"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            if kind == "tools":
+                self.tool_rounds += 1
+            else:
+                self.model_calls += 1
+            self.hops.append({"kind": kind, "ms": round((time.perf_counter() - started) * 1000, 1)})
+
+    def summary(self):
+        return {
+            "tool_rounds": self.tool_rounds,
+            "model_calls": self.model_calls,
+            "tokens": self.tokens,
+            "elapsed_ms": round((time.monotonic() - self.started) * 1000, 1),
+            "stopped_by": self.stopped_by,
+            "hops": self.hops,
+        }
+
+class AgentLoopStats:
+    """Aggregated agent loop figures for /api/metrics"""
+
+    def __init__(self, max_hops, deadline, token_budget, answer_time=10.0):
+        self.max_hops = max_hops
+        self.deadline = deadline
+        self.token_budget = token_budget
+        self.answer_time = answer_time
+
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.tool_rounds = {}
+        self.stopped_by = {}
+        self.last_turn = None
+
+    def new_turn(self):
+        return AgentTurn(self.max_hops, self.deadline, self.token_budget, self.answer_time)
+
+    def record(self, turn):
+        summary = turn.summary()
+        with self._lock:
+            self.turns += 1
+            self.tool_rounds[turn.tool_rounds] = self.tool_rounds.get(turn.tool_rounds, 0) + 1
+            if turn.stopped_by:
+                self.stopped_by[turn.stopped_by] = self.stopped_by.get(turn.stopped_by, 0) + 1
+            self.last_turn = summary
+        return summary
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_hops": self.max_hops,
+                "deadline": self.deadline,
+                "answer_time": self.answer_time,
+                "token_budget": self.token_budget,
+                "turns": self.turns,
+                "tool_rounds": {str(rounds): count for rounds, count in sorted(self.tool_rounds.items())},
+                "stopped_by": dict(self.stopped_by),
+                "last_turn": self.last_turn,
+            }
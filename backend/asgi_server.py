@@ -0,0 +1,165 @@
+import asyncio
+from functools import lru_cache
+from quart import Quart, request, jsonify
+from quart_cors import cors
+from openai import AsyncOpenAI
+from assistant import (
+    endpoint, require_token, model_router, llm_deadline, get_session, save_session, add_user_message,
+    route_locally, next_step, remember_reply, run_tool_calls, clean_ai_response, agent_loop,
+    runtime_stats, readiness, estimate_prompt_tokens, next_page, browse_shoes, browse_max_age,
+    RateLimitExceeded
+)
+
+# Async serving mode: run with `hypercorn asgi_server:app --bind 0.0.0.0:5000`
+app = cors(Quart(__name__))
+
+# OpenAI Configuration, created on first use so a missing token does not stop the app from starting
+@lru_cache(maxsize=1)
+def llm_client():
+    return AsyncOpenAI(
+        base_url=endpoint,
+        api_key=require_token(),
+        # Failures are retried on the next healthy model by the router instead
+        max_retries=0,
+    )
+
+async def complete(deadline=None, **kwargs):
+    """
+    Create a chat completion on the healthiest model, retrying on the next one
+    on failure, within `llm_deadline` or the shorter `deadline` left in the turn.
+    """
+    # Built first so a configuration error (missing token) is not counted against the models
+    client = llm_client()
+    return await model_router.acall(
+        lambda model, timeout: client.chat.completions.create(model=model, timeout=timeout, **kwargs),
+        deadline=min(llm_deadline, deadline) if deadline is not None else llm_deadline,
+        tokens=estimate_prompt_tokens(kwargs["messages"]),
+        record_latency=not kwargs.get("stream")
+    )
+
+@app.route('/api/chat', methods=['POST'])
+async def chat():
+    try:
+        data = await request.get_json()
+        user_message = data.get('message', '')
+        session_id = data.get('session_id', 'default')
+
+        # The session store may be MongoDB, keep its blocking calls off the event loop
+        session = await asyncio.to_thread(get_session, session_id)
+        conversation_history = session["conversation_history"]
+
+        # Add user message to history, trimmed to the context budget
+        add_user_message(session, user_message)
+
+        shoes_data = None
+        ai_reply = None
+        agent = agent_loop.new_turn()
+
+        # Simple requests skip the model's tool-selection step (may refresh the facet cache)
+        tool_calls = await asyncio.to_thread(route_locally, session, user_message)
+
+        # Keep running tools until the model answers or the turn's budget runs out
+        while ai_reply is None:
+            if tool_calls:
+                # Catalog queries are short blocking PyMongo calls, keep them off the event loop
+                with agent.hop("tools"):
+                    shoes_data = await asyncio.to_thread(
+                        run_tool_calls, tool_calls, session
+                    ) or shoes_data
+
+            # Common openers are answered from the shared response cache
+            cache_key, assistant_message, completion_kwargs = next_step(session, agent)
+
+            if assistant_message is None:
+                with agent.hop("model"):
+                    response = await complete(deadline=agent.remaining(keep_answer_time="tools" in completion_kwargs), **completion_kwargs)
+                assistant_message = response.choices[0].message.model_dump(exclude_none=True)
+                remember_reply(cache_key, assistant_message)
+
+            tool_calls = assistant_message.get("tool_calls")
+            if tool_calls:
+                conversation_history.append(assistant_message)
+            else:
+                ai_reply = assistant_message.get("content") or ""
+
+        agent_loop.record(agent)
+
+        conversation_history.append({"role": "assistant", "content": ai_reply})
+
+        await asyncio.to_thread(save_session, session_id, session)
+
+        # Clean the AI response to ensure no product data leaks through
+        clean_reply = clean_ai_response(ai_reply, shoes_data)
+
+        return jsonify({
+            "message": clean_reply,
+            "shoes_data": shoes_data,
+            "session_id": session_id
+        })
+
+    except RateLimitExceeded as e:
+        # Shed load with a retry hint instead of holding the worker
+        retry_after = max(1, round(e.retry_after or 1))
+        return jsonify({"error": str(e)}), 429, {"Retry-After": str(retry_after)}
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/shoes/next', methods=['POST'])
+async def shoes_next():
+    """More shoes from the session's last search or availability check, without a model call"""
+    try:
+        data = await request.get_json()
+        session_id = data.get('session_id', 'default')
+
+        session = await asyncio.to_thread(get_session, session_id)
+        result = await asyncio.to_thread(next_page, session)
+
+        if result is None:
+            return jsonify({"shoes_data": [], "has_more": False, "session_id": session_id})
+        if "error" in result.data:
+            return jsonify({"error": result.data["error"]}), 500
+
+        await asyncio.to_thread(save_session, session_id, session)
+
+        return jsonify({
+            "shoes_data": result.shoes or [],
+            "has_more": result.data.get("has_more", False),
+            "session_id": session_id
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/shoes', methods=['GET'])
+async def browse():
+    """Catalog browsing with the search_shoes filters, straight from the catalog cache without the model"""
+    try:
+        page, etag = await asyncio.to_thread(browse_shoes, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    # Unchanged pages are revalidated with If-None-Match and answered without a body
+    headers = {"ETag": f'"{etag}"', "Cache-Control": f"public, max-age={browse_max_age}"}
+    if request.if_none_match.contains(etag):
+        return "", 304, headers
+    return jsonify(page), 200, headers
+
+@app.route('/api/health', methods=['GET'])
+async def health():
+    return jsonify({"status": "healthy", "message": "Techno Shoe API is running!"})
+
+@app.route('/api/ready', methods=['GET'])
+async def ready():
+    """Readiness probe: 200 once MongoDB answers and the LLM token is configured, 503 before"""
+    report = await asyncio.to_thread(readiness.check)
+    return jsonify(report), 200 if report["ready"] else 503
+
+@app.route('/api/metrics', methods=['GET'])
+async def metrics():
+    return jsonify(runtime_stats())
+
+if __name__ == '__main__':
+    app.run(debug=True, host='0.0.0.0', port=5000)
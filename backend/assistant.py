@@ -0,0 +1,751 @@
+import os
+import json
+import time
+from datetime import datetime
+from dotenv import load_dotenv
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from context_window import ContextWindow, estimate_prompt_tokens, split_turns
+from tool_results import ToolResult
+from database.schema import SHOE_SORTS, normalize_value
+from database.connection import get_database, ping, pool_stats
+from catalog_events import CatalogEvents
+from catalog_cache import FacetCache
+from catalog_engine import CatalogEngine
+from catalog_watcher import CatalogWatcher
+from catalog_pages import MAX_PAGE_SIZE, decode_cursor, find_page
+from leaderboard import RecommendationLeaderboard, match_facets
+from intent_router import IntentRouter
+from model_router import ModelRouter
+from rate_limiter import ModelRateLimiter, RateLimitExceeded
+from response_cache import ResponseCache, fingerprint
+from agent_loop import AgentLoopStats
+from search_cache import SearchCache
+from sessions import InMemorySessionBackend, MongoSessionBackend
+from readiness import Readiness
+
+# Cold start is measured from here to the first passing readiness check
+import_started_at = time.monotonic()
+
+load_dotenv()
+
+# OpenAI Configuration
+ai_models = ["openai/gpt-4.1", "openai/gpt-4.1-mini", "openai/gpt-4.1-nano", "openai/gpt-4o", "openai/gpt-4o-mini", "openai/o4-mini"]
+token = os.getenv("GITHUB_TOKEN")
+endpoint = "https://models.github.ai/inference"
+llm_deadline = float(os.getenv("LLM_DEADLINE_SECONDS", 30))
+model_router = ModelRouter(
+    ai_models,
+    policy=os.getenv("MODEL_ROUTING_POLICY", "priority"),
+    limiter=ModelRateLimiter(
+        requests_per_minute=int(os.getenv("LLM_REQUESTS_PER_MINUTE", 10)),
+        tokens_per_minute=int(os.getenv("LLM_TOKENS_PER_MINUTE", 50000)),
+        max_queue=int(os.getenv("LLM_QUEUE_SIZE", 32)),
+        max_wait=float(os.getenv("LLM_QUEUE_MAX_WAIT", 10)),
+    )
+)
+
+def require_token():
+    """The GitHub Models token, checked when the LLM client is first needed rather than at import"""
+    if not token:
+        raise RuntimeError("GITHUB_TOKEN is not set")
+    return token
+
+# Database instance, on the shared connection pool (connects in the background, not at import)
+db = get_database()
+
+# Catalog change notifications and in-memory catalog caches
+catalog_events = CatalogEvents(debounce=float(os.getenv("CATALOG_EVENT_DEBOUNCE", 0.5)))
+facet_cache = FacetCache(db, ttl=int(os.getenv("FACET_CACHE_TTL", 300)))
+leaderboard = RecommendationLeaderboard(db, ttl=int(os.getenv("LEADERBOARD_TTL", 600)))
+catalog_events.subscribe(leaderboard.apply_change)
+
+# CATALOG_ENGINE=memory answers the tool queries from an in-process column store instead of MongoDB
+catalog_engine = None
+if os.getenv("CATALOG_ENGINE", "mongo") == "memory":
+    catalog_engine = CatalogEngine(db, ttl=int(os.getenv("CATALOG_ENGINE_TTL", 300)))
+    catalog_events.subscribe(catalog_engine.invalidate)
+
+# Shoes returned per tool call, further ones are paged with the next_cursor token
+search_result_limit = int(os.getenv("SEARCH_RESULT_LIMIT", 10))
+availability_result_limit = int(os.getenv("AVAILABILITY_RESULT_LIMIT", 10))
+
+# /api/shoes page size, and how long browsers and proxies may reuse a page
+browse_page_size = int(os.getenv("BROWSE_PAGE_SIZE", 20))
+browse_max_age = int(os.getenv("BROWSE_MAX_AGE", 30))
+
+# Multi-step tool use within one customer turn
+agent_loop = AgentLoopStats(
+    max_hops=int(os.getenv("AGENT_MAX_HOPS", 4)),
+    deadline=float(os.getenv("AGENT_DEADLINE_SECONDS", 45)),
+    token_budget=int(os.getenv("AGENT_TOKEN_BUDGET", 16000)),
+    answer_time=float(os.getenv("AGENT_ANSWER_SECONDS", 10))
+)
+
+# Shared replies for common openers ("hi", "what brands do you have?")
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", 512)),
+    ttl=int(os.getenv("RESPONSE_CACHE_TTL", 600))
+)
+
+def invalidate_facets(version, change):
+    # Cached replies only quote the facets, they stay valid as long as the facets do
+    if facet_cache.invalidate(version, change):
+        response_cache.invalidate()
+
+catalog_events.subscribe(invalidate_facets)
+
+# Results of recent searches, shared between customers
+search_cache = SearchCache(
+    max_entries=int(os.getenv("SEARCH_CACHE_SIZE", 256)),
+    ttl=int(os.getenv("SEARCH_CACHE_TTL", 120))
+)
+catalog_events.subscribe(search_cache.invalidate)
+
+# Dependency status for /api/ready, warmed up in the background so startup never waits on MongoDB
+readiness = Readiness(
+    {"mongodb": ping, "llm_token": require_token},
+    started_at=import_started_at,
+    target_seconds=float(os.getenv("STARTUP_READY_TARGET_SECONDS", 5))
+)
+
+def warm_up_catalog():
+    facet_cache.get()
+    if catalog_engine is not None:
+        catalog_engine.snapshot()
+
+readiness.warm_up(on_ready=warm_up_catalog)
+
+# Publishes shoe changes from MongoDB to the catalog caches above (CATALOG_WATCH=off to disable)
+catalog_watcher = CatalogWatcher(db.shoes, catalog_events, poll_interval=float(os.getenv("CATALOG_POLL_SECONDS", 15)))
+if os.getenv("CATALOG_WATCH", "on") != "off":
+    catalog_watcher.start()
+
+# Local intent routing for simple requests
+intent_router = IntentRouter(facet_cache, threshold=float(os.getenv("INTENT_ROUTER_THRESHOLD", 0.8)))
+
+# Store customer sessions
+def new_session():
+    return {
+        "conversation_history": [get_system_message()],
+        "customer_state": {
+            "interested_products": [],
+            "conversation_turns": 0,
+            "serious_interest_indicators": 0,
+            "contact_info": {}
+        }
+    }
+
+# Prompt size control
+context_window = ContextWindow(
+    budget_tokens=int(os.getenv("CONTEXT_TOKEN_BUDGET", 6000)),
+    keep_turns=int(os.getenv("CONTEXT_KEEP_TURNS", 6)),
+    summary_tokens=int(os.getenv("CONTEXT_SUMMARY_TOKENS", 300)),
+)
+
+# SESSION_BACKEND=mongo shares sessions across workers and replicas
+if os.getenv("SESSION_BACKEND", "memory") == "mongo":
+    session_store = MongoSessionBackend(
+        new_session,
+        db.sessions,
+        idle_ttl=int(os.getenv("SESSION_IDLE_TTL", 1800)),
+    )
+else:
+    session_store = InMemorySessionBackend(
+        new_session,
+        max_sessions=int(os.getenv("SESSION_MAX_COUNT", 1000)),
+        idle_ttl=int(os.getenv("SESSION_IDLE_TTL", 1800)),
+        max_bytes=int(os.getenv("SESSION_MAX_MEMORY_MB", 64)) * 1024 * 1024,
+    )
+
+# Catalog reads shared by search_shoes and /api/shoes
+def shoe_filter(brand=None, category=None, price_min=None, price_max=None, color=None,
+                gender=None, size=None, in_stock_only=True, min_rating=None):
+    """MongoDB filter for the search_shoes criteria"""
+    query_filter = {}
+
+    if brand:
+        query_filter["brand_lc"] = normalize_value(brand)
+
+    if category:
+        query_filter["category_lc"] = normalize_value(category)
+
+    if price_min is not None or price_max is not None:
+        price_filter = {}
+        if price_min is not None:
+            price_filter["$gte"] = float(price_min)
+        if price_max is not None:
+            price_filter["$lte"] = float(price_max)
+        query_filter["price"] = price_filter
+
+    if color:
+        query_filter["color_lc"] = normalize_value(color)
+
+    if gender:
+        query_filter["gender_lc"] = normalize_value(gender)
+
+    if size:
+        query_filter["sizes"] = int(size)
+
+    if in_stock_only:
+        query_filter["in_stock"] = True
+
+    if min_rating is not None:
+        query_filter["rating"] = {"$gte": float(min_rating)}
+
+    return query_filter
+
+def find_shoes(limit, cursor=None, sort="rating", **criteria):
+    """One page of the shoes matching the search_shoes criteria: (shoes, has_more, next_cursor)"""
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    query_filter = shoe_filter(**criteria)
+    after = decode_cursor(cursor, sort) if cursor else None
+
+    cache_key = search_cache.key(query_filter, catalog_events.version, limit, cursor, sort)
+    page = search_cache.get(cache_key)
+
+    if page is None:
+        if catalog_engine is not None:
+            page = catalog_engine.search(limit=limit, after=after, sort=sort, **criteria)
+        else:
+            page = find_page(db.shoes, query_filter, limit, after, sort)
+
+        search_cache.put(cache_key, page)
+
+    return page
+
+# Tool Functions
+def search_shoes(brand=None, category=None, price_min=None, price_max=None, color=None,
+                gender=None, size=None, in_stock_only=True, min_rating=None, cursor=None):
+    """Search for shoes in the database based on various criteria"""
+    try:
+        results, has_more, next_cursor = find_shoes(
+            search_result_limit, cursor, brand=brand, category=category, price_min=price_min,
+            price_max=price_max, color=color, gender=gender, size=size,
+            in_stock_only=in_stock_only, min_rating=min_rating
+        )
+
+        if not results:
+            return ToolResult({
+                "message": "No shoes found matching your criteria.",
+                "suggestions": "Try adjusting your requirements or check our full catalog."
+            })
+
+        data = {
+            "found_shoes": len(results),
+            "has_more": has_more,
+            "message": f"Found {len(results)} shoes matching your criteria!"
+        }
+        if has_more:
+            data["next_cursor"] = next_cursor
+        return ToolResult(data, shoes=results)
+
+    except Exception as e:
+        return ToolResult({"error": f"Database search error: {str(e)}"})
+
+def get_shoe_recommendations(preferences=None):
+    """Get general shoe recommendations based on customer preferences"""
+    try:
+        facets = facet_cache.get()
+        matched = match_facets(preferences, {
+            "category": facets["categories"],
+            "gender": facets["genders"],
+            "brand": facets["brands"],
+            "color": facets["colors"],
+        })
+
+        ranking = catalog_engine or leaderboard
+        results = ranking.top(**matched, limit=8)
+
+        # Relax the least important preferences first when nothing matches
+        for facet in ["color", "brand", "gender", "category"]:
+            if results or not matched:
+                break
+            matched.pop(facet, None)
+            results = ranking.top(**matched, limit=8)
+
+        data = {"message": "Here are our top-rated shoes currently in stock!"}
+        if matched:
+            data["matched_preferences"] = matched
+        return ToolResult(data, shoes=results)
+
+    except Exception as e:
+        return ToolResult({"error": f"Recommendation error: {str(e)}"})
+
+def get_brands_and_categories():
+    """Get available brands and categories from the cached catalog facets"""
+    try:
+        facets = facet_cache.get()
+
+        return ToolResult({
+            "available_brands": facets["brands"],
+            "available_categories": facets["categories"],
+            "available_colors": facets["colors"],
+            "available_genders": facets["genders"],
+            "size_range": facets["size_range"],
+            "price_range": facets["price_range"],
+            "message": "Here's what we have available in our store!"
+        })
+
+    except Exception as e:
+        return ToolResult({"error": f"Catalog error: {str(e)}"})
+
+def check_shoe_availability(shoe_name=None, size=None, cursor=None):
+    """Check if a specific shoe is available in a specific size"""
+    try:
+        after = decode_cursor(cursor) if cursor else None
+
+        if catalog_engine is not None:
+            results, has_more, next_cursor = catalog_engine.availability(
+                shoe_name, size, limit=availability_result_limit, after=after
+            )
+        else:
+            query_filter = {}
+
+            if shoe_name:
+                # Anchored prefix match so the name_lc index can be used
+                query_filter["name_lc"] = {"$regex": "^" + re.escape(normalize_value(shoe_name))}
+
+            if size:
+                query_filter["sizes"] = int(size)
+
+            query_filter["in_stock"] = True
+
+            results, has_more, next_cursor = find_page(db.shoes, query_filter, availability_result_limit, after)
+
+            # Partial names ("Running 12") fall back to the text index
+            if not results and shoe_name:
+                del query_filter["name_lc"]
+                query_filter["$text"] = {"$search": f'"{shoe_name}"'}
+                results, has_more, next_cursor = find_page(db.shoes, query_filter, availability_result_limit, after)
+
+        data = {
+            "available": len(results) > 0,
+            "has_more": has_more,
+            "message": f"{'Available!' if results else 'Sorry, not available in that size.'}"
+        }
+        if has_more:
+            data["next_cursor"] = next_cursor
+        return ToolResult(data, shoes=results)
+
+    except Exception as e:
+        return ToolResult({"error": f"Availability check error: {str(e)}"})
+
+def save_customer_info(first_name, last_name=None, age=None, phone=None,
+                      interested_products=None, conversation_history=None):
+    """Save customer information to the database"""
+    try:
+        customer_data = {
+            "first_name": first_name,
+            "last_name": last_name,
+            "age": int(age) if age else None,
+            "phone": phone,
+            "interested_products": interested_products or [],
+            "conversation_history": conversation_history or [],
+            "created_at": datetime.now()
+        }
+
+        customer_data = {k: v for k, v in customer_data.items() if v is not None}
+
+        result = db.customers.insert_one(customer_data)
+
+        return ToolResult({
+            "success": True,
+            "customer_id": str(result.inserted_id),
+            "message": "Customer information saved successfully!"
+        })
+
+    except Exception as e:
+        return ToolResult({
+            "success": False,
+            "error": f"Failed to save customer info: {str(e)}"
+        })
+
+# Query string parameters of /api/shoes with their types
+BROWSE_FILTERS = {
+    "brand": str,
+    "category": str,
+    "color": str,
+    "gender": str,
+    "size": int,
+    "price_min": float,
+    "price_max": float,
+    "min_rating": float,
+}
+
+def browse_shoes(params):
+    """
+    Catalog page for /api/shoes from its query string: the search_shoes
+    filters plus `sort`, `limit` and `cursor`. Returns the page and its ETag,
+    raises ValueError on an invalid parameter.
+    """
+    criteria = {}
+    for name, cast in BROWSE_FILTERS.items():
+        if params.get(name):
+            try:
+                criteria[name] = cast(params[name])
+            except ValueError:
+                raise ValueError(f"Invalid {name}: {params[name]}")
+    criteria["in_stock_only"] = params.get("in_stock_only", "true").lower() not in ("0", "false", "no")
+
+    sort = params.get("sort", "rating")
+    if sort not in SHOE_SORTS:
+        raise ValueError(f"Invalid sort: {sort} (use {', '.join(SHOE_SORTS)})")
+
+    try:
+        limit = int(params.get("limit", browse_page_size))
+    except ValueError:
+        raise ValueError(f"Invalid limit: {params['limit']}")
+
+    shoes, has_more, next_cursor = find_shoes(limit, params.get("cursor"), sort, **criteria)
+    page = {"shoes": shoes, "has_more": has_more, "next_cursor": next_cursor}
+    return page, fingerprint(page)
+
+# Tool definitions
+tools = [
+    {
+        "type": "function",
+        "function": {
+            "name": "search_shoes",
+            "description": "Search for shoes based on customer preferences",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "brand": {"type": "string", "description": "Shoe brand"},
+                    "category": {"type": "string", "description": "Shoe category"},
+                    "price_min": {"type": "number", "description": "Minimum price in DH"},
+                    "price_max": {"type": "number", "description": "Maximum price in DH"},
+                    "color": {"type": "string", "description": "Shoe color"},
+                    "gender": {"type": "string", "description": "Target gender"},
+                    "size": {"type": "number", "description": "Shoe size (EU)"},
+                    "in_stock_only": {"type": "boolean", "description": "Only show in-stock items", "default": True},
+                    "min_rating": {"type": "number", "description": "Minimum rating (1-5)"},
+                    "cursor": {"type": "string", "description": "next_cursor of a previous search, for more results"}
+                }
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_shoe_recommendations",
+            "description": "Get general shoe recommendations",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "preferences": {"type": "string", "description": "Customer preferences"}
+                }
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_brands_and_categories",
+            "description": "Get available brands, categories, and colors",
+            "parameters": {"type": "object", "properties": {}}
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "check_shoe_availability",
+            "description": "Check shoe availability in specific size",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "shoe_name": {"type": "string", "description": "Name of the shoe"},
+                    "size": {"type": "number", "description": "Shoe size (EU)"},
+                    "cursor": {"type": "string", "description": "next_cursor of a previous check, for more results"}
+                }
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "save_customer_info",
+            "description": "Save customer information",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "first_name": {"type": "string", "description": "Customer's first name"},
+                    "last_name": {"type": "string", "description": "Customer's last name"},
+                    "age": {"type": "number", "description": "Customer's age"},
+                    "phone": {"type": "string", "description": "Customer's phone number"},
+                    "interested_products": {"type": "array", "items": {"type": "string"}},
+                    "conversation_history": {"type": "array", "items": {"type": "object"}}
+                },
+                "required": ["first_name"]
+            }
+        }
+    }
+]
+
+available_functions = {
+    "search_shoes": search_shoes,
+    "get_shoe_recommendations": get_shoe_recommendations,
+    "get_brands_and_categories": get_brands_and_categories,
+    "check_shoe_availability": check_shoe_availability,
+    "save_customer_info": save_customer_info
+}
+
+def get_system_message():
+    return {
+        "role": "system",
+        "content": """You are Amine, a helpful AI shopping assistant for Techno Shoe in Casablanca Sidi Maarouf, Morocco.
+
+STORE INFO:
+- Name: Techno Shoe
+- Location: Casablanca Sidi Maarouf, Morocco
+- Currency: Moroccan Dirham (DH)
+- Sizes: European sizes (36-47)
+
+PERSONALITY: Be friendly, enthusiastic, and knowledgeable.
+
+CRITICAL INSTRUCTIONS FOR FRONTEND INTEGRATION:
+1. Your responses are sent to a frontend application that handles data display separately
+2. NEVER include raw shoe data (JSON objects, detailed product specs) in your conversational responses
+3. When you use tools to fetch shoe data, the frontend automatically receives and displays this data
+4. Your role is to provide conversational context and guidance, NOT to display product details
+5. Instead of showing product details, refer to them conversationally like:
+   - "I found some great options for you!"
+   - "Here are [X] shoes that match your criteria"
+   - "The products are now displayed for you to browse"
+   - "Take a look at these recommendations"
+
+EXAMPLE GOOD RESPONSES:
+- "I found 5 Nike sneakers in your size! Take a look at the options displayed."
+- "Here are our top-rated shoes currently available. What do you think?"
+- "Perfect! I found some great running shoes within your budget."
+
+EXAMPLE BAD RESPONSES (DON'T DO THIS):
+- Including shoe names, prices, or detailed specs in your text
+- Listing product information like "Nike Air Max - 850 DH - Rating: 4.5"
+- Showing JSON data or structured product information
+
+Remember: Be conversational and helpful, but let the frontend handle all product data display!"""
+    }
+
+def clean_ai_response(ai_reply, shoes_data):
+    """
+    Clean the AI response to ensure no shoe data leaks into the conversational text
+    """
+    if not shoes_data:
+        return ai_reply
+    
+    # Remove any potential product data patterns from the response
+    # This is a safety net in case the LLM still includes product info
+    
+    # Pattern to match common product data formats
+    patterns_to_remove = [
+        r'\{[^}]*"name"[^}]*\}',  # JSON-like objects with "name" field
+        r'\{[^}]*"price"[^}]*\}',  # JSON-like objects with "price" field
+        r'\{[^}]*"brand"[^}]*\}',  # JSON-like objects with "brand" field
+        r'SHOES_DATA:.*?(?=\n\n|\n[A-Z]|$)',  # SHOES_DATA sections
+        r'\[.*?"_id".*?\]',  # Arrays with _id fields
+    ]
+    
+    cleaned_response = ai_reply
+    for pattern in patterns_to_remove:
+        cleaned_response = re.sub(pattern, '', cleaned_response, flags=re.DOTALL | re.IGNORECASE)
+    
+    # Clean up any extra whitespace or newlines left behind
+    cleaned_response = re.sub(r'\n\s*\n\s*\n', '\n\n', cleaned_response)
+    cleaned_response = cleaned_response.strip()
+    
+    return cleaned_response
+
+def get_session(session_id):
+    """Initialize or get the session for a customer"""
+    return session_store.get(session_id)
+
+def add_user_message(session, user_message):
+    """Append the customer's message and trim the history to the context budget"""
+    session["conversation_history"].append({"role": "user", "content": user_message})
+    return context_window.fit(session)
+
+def prompt_messages(session):
+    """Messages to send to the model for this session"""
+    return context_window.messages(session)
+
+def save_session(session_id, session):
+    """Store the session back once a turn has completed"""
+    session_store.save(session_id, session)
+
+def route_locally(session, user_message):
+    """
+    Pick the tool for simple requests without asking the model.
+    Records the tool call in the history and returns it, or None when the
+    message needs the model. Only the first message of a conversation is
+    routed: later ones ("size 42", "red") usually refine the previous request
+    and need the history.
+    """
+    user_messages = sum(1 for message in session["conversation_history"] if message.get("role") == "user")
+    if user_messages > 1 or session.get("context_summary"):
+        return None
+
+    routed = intent_router.route(user_message)
+    if routed is None:
+        return None
+
+    function_name, function_args = routed
+    tool_calls = [{
+        "id": f"call_local_{uuid.uuid4().hex[:24]}",
+        "type": "function",
+        "function": {"name": function_name, "arguments": json.dumps(function_args)}
+    }]
+    session["conversation_history"].append({"role": "assistant", "tool_calls": tool_calls})
+    return tool_calls
+
+# Tools whose results depend on the catalog only, not on the customer
+CACHEABLE_TOOLS = {"get_brands_and_categories"}
+
+def cached_reply(session, kind):
+    """
+    Look up a shared reply for the session's next completion, `kind` being
+    "select" for a call offering tools or "reply" for a forced final answer.
+    Only first turns whose tool calls so far are all catalog-only are shared.
+    Returns (cache_key, assistant_message); the message is None on a miss and
+    the key is None when the reply should not be shared.
+    """
+    if session.get("context_summary"):
+        return None, None
+    turns = split_turns(session["conversation_history"][1:])
+    if len(turns) != 1:
+        return None, None
+
+    called = {
+        tool_call["function"]["name"]
+        for message in turns[0] for tool_call in message.get("tool_calls") or []
+    }
+    if not called <= CACHEABLE_TOOLS:
+        return None, None
+
+    key = response_cache.key(kind, prompt_messages(session), tools if kind == "select" else None, model_router.models)
+    message = response_cache.get(key)
+    if message is None:
+        return key, None
+
+    message = dict(message)
+    if message.get("tool_calls"):
+        # Tool call ids must stay unique within a conversation
+        message["tool_calls"] = [
+            {**tool_call, "id": f"call_cached_{uuid.uuid4().hex[:24]}"} for tool_call in message["tool_calls"]
+        ]
+    return key, message
+
+def remember_reply(cache_key, assistant_message):
+    """Share a completion with later sessions sending the same prompt"""
+    if cache_key is not None:
+        response_cache.put(cache_key, dict(assistant_message))
+
+def next_step(session, agent):
+    """
+    Prepare the agent loop's next model call: tools are offered while the
+    turn's budget lasts, then the model has to answer.
+    Returns (cache_key, cached_message, completion_kwargs).
+    """
+    offer_tools = agent.can_use_tools()
+    cache_key, assistant_message = cached_reply(session, "select" if offer_tools else "reply")
+
+    completion_kwargs = {"messages": prompt_messages(session), "temperature": 0.7, "top_p": 0.9}
+    if offer_tools:
+        completion_kwargs.update(tools=tools, tool_choice="auto")
+
+    if assistant_message is None:
+        agent.spend(estimate_prompt_tokens(completion_kwargs["messages"]))
+    return cache_key, assistant_message, completion_kwargs
+
+# Tool calls of one turn run side by side, each is mostly a blocking MongoDB query
+tool_executor = ThreadPoolExecutor(max_workers=int(os.getenv("TOOL_WORKERS", 4)), thread_name_prefix="tool")
+
+# Tools whose results can be paged further with /api/shoes/next
+PAGED_TOOLS = {"search_shoes", "check_shoe_availability"}
+
+def run_tool_call(tool_call):
+    function_name = tool_call["function"]["name"]
+    if function_name not in available_functions:
+        return None
+
+    function_args = json.loads(tool_call["function"]["arguments"] or "{}")
+    return available_functions[function_name](**function_args)
+
+def run_tool_calls(tool_calls, session):
+    """Execute the tool calls requested by the model and return shoes data for the frontend"""
+    conversation_history = session["conversation_history"]
+    shoes_data = None
+
+    if len(tool_calls) > 1:
+        # Results come back in the order of the tool calls
+        results = list(tool_executor.map(run_tool_call, tool_calls))
+    else:
+        results = [run_tool_call(tool_call) for tool_call in tool_calls]
+
+    for tool_call, result in zip(tool_calls, results):
+        function_name = tool_call["function"]["name"]
+
+        if result is not None:
+            # The frontend gets the full shoes data, the model only a digest of it
+            function_response = result.content
+            if result.shoes is not None:
+                shoes_data = result.shoes
+            if function_name in PAGED_TOOLS:
+                # Empty results too, "show more" must never page an older query
+                remember_query(session, tool_call, result)
+        else:
+            function_response = f"Error: Function {function_name} not found"
+
+        conversation_history.append({
+            "tool_call_id": tool_call["id"],
+            "role": "tool",
+            "name": function_name,
+            "content": function_response
+        })
+
+    return shoes_data
+
+def remember_query(session, tool_call, result):
+    """Keep the last catalog query of the session and its cursor for /api/shoes/next"""
+    function_args = json.loads(tool_call["function"]["arguments"] or "{}")
+    function_args.pop("cursor", None)
+    session["customer_state"]["last_query"] = {
+        "function": tool_call["function"]["name"],
+        "arguments": function_args,
+        "cursor": result.data.get("next_cursor"),
+    }
+
+def next_page(session):
+    """
+    Next page of the session's last catalog query, read with its keyset
+    cursor and no model call. Returns the ToolResult, or None when there is
+    nothing more to show.
+    """
+    last_query = session["customer_state"].get("last_query")
+    if not last_query or not last_query.get("cursor"):
+        return None
+
+    result = available_functions[last_query["function"]](**last_query["arguments"], cursor=last_query["cursor"])
+    if "error" not in result.data:
+        last_query["cursor"] = result.data.get("next_cursor")
+    return result
+
+def runtime_stats():
+    """Counters exposed on /api/metrics"""
+    return {
+        "models": model_router.stats(),
+        "sessions": session_store.stats(),
+        "mongo_pool": pool_stats(),
+        "context": context_window.stats(),
+        "facets": facet_cache.stats(),
+        "leaderboard": leaderboard.stats(),
+        "catalog_engine": catalog_engine.stats() if catalog_engine is not None else None,
+        "intent_router": intent_router.stats(),
+        "agent_loop": agent_loop.stats(),
+        "response_cache": response_cache.stats(),
+        "search_cache": search_cache.stats(),
+        "catalog_events": catalog_events.stats(),
+        "catalog_watcher": catalog_watcher.stats(),
+        "startup": readiness.stats(),
+    }
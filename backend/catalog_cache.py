@@ -0,0 +1,123 @@
+import time
+import threading
+
+FACETS_PIPELINE = [
+    {"$group": {
+        "_id": None,
+        "brands": {"$addToSet": "$brand"},
+        "categories": {"$addToSet": "$category"},
+        "colors": {"$addToSet": "$color"},
+        "genders": {"$addToSet": "$gender"},
+        "min_size": {"$min": {"$min": "$sizes"}},
+        "max_size": {"$max": {"$max": "$sizes"}},
+        "min_price": {"$min": "$price"},
+        "max_price": {"$max": "$price"},
+        "total": {"$sum": 1},
+        "in_stock": {"$sum": {"$cond": ["$in_stock", 1, 0]}},
+    }}
+]
+
+class FacetCache:
+    """
+    In-memory snapshot of the catalog facets (brands, categories, colors,
+    genders, size range and price bounds), computed with one aggregation and
+    refreshed once older than `ttl` seconds or when the catalog changes.
+    """
+
+    def __init__(self, db, ttl=300):
+        self.db = db
+        self.ttl = ttl
+
+        self._snapshot = None
+        self._loaded_at = 0.0
+        self._generation = 0  # bumped by every invalidation
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.last_refresh_ms = None
+
+    def get(self):
+        """Return the current facet snapshot, refreshing it if stale"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._loaded_at < self.ttl:
+            self.hits += 1
+            return snapshot
+
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._snapshot is not None and time.monotonic() - self._loaded_at < self.ttl:
+                self.hits += 1
+                return self._snapshot
+
+            self.misses += 1
+            return self._refresh()
+
+    def _refresh(self):
+        started = time.perf_counter()
+        generation = self._generation
+        groups = list(self.db.shoes.aggregate(FACETS_PIPELINE))
+        group = groups[0] if groups else {}
+
+        snapshot = {
+            "brands": sorted(value for value in group.get("brands", []) if value),
+            "categories": sorted(value for value in group.get("categories", []) if value),
+            "colors": sorted(value for value in group.get("colors", []) if value),
+            "genders": sorted(value for value in group.get("genders", []) if value),
+            "size_range": [group.get("min_size"), group.get("max_size")],
+            "price_range": [group.get("min_price"), group.get("max_price")],
+            "total": group.get("total", 0),
+            "in_stock": group.get("in_stock", 0),
+        }
+        self.refreshes += 1
+        self.last_refresh_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        # Invalidated while aggregating: the result may predate the change, answer with it but do not keep it
+        if self._generation == generation:
+            self._snapshot = snapshot
+            self._loaded_at = time.monotonic()
+        return snapshot
+
+    def covers(self, shoe):
+        """Whether the current snapshot already lists every facet value of `shoe`"""
+        snapshot = self._snapshot
+        if snapshot is None or shoe.get("_deleted"):
+            return False
+
+        for field, facet in [("brand", "brands"), ("category", "categories"), ("color", "colors"), ("gender", "genders")]:
+            if shoe.get(field) and shoe[field] not in snapshot[facet]:
+                return False
+
+        min_size, max_size = snapshot["size_range"]
+        if any(min_size is None or not (min_size <= size <= max_size) for size in shoe.get("sizes") or []):
+            return False
+
+        min_price, max_price = snapshot["price_range"]
+        price = shoe.get("price")
+        return price is None or (min_price is not None and min_price <= price <= max_price)
+
+    def invalidate(self, version=None, change=None):
+        """
+        Drop the snapshot so the next read recomputes it (catalog event
+        subscriber). Stock, price and rating updates inside the known facets
+        keep it, only the in-stock and total counts lag until the TTL.
+        Returns whether the snapshot was dropped.
+        """
+        if change is not None and self.covers(change):
+            return False
+        self._generation += 1
+        self._snapshot = None
+        return True
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "refreshes": self.refreshes,
+            "last_refresh_ms": self.last_refresh_ms,
+            "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._snapshot else None,
+        }
@@ -0,0 +1,346 @@
+import re
+import time
+import bisect
+import threading
+from operator import itemgetter
+from array import array
+from database.schema import CATALOG_PROJECTION, normalize_value, shoe_card
+from catalog_pages import MAX_PAGE_SIZE, encode_cursor
+
+FACET_FIELDS = ["brand", "category", "color", "gender"]
+PRICE_BANDS = 64
+NONZERO_BYTE = re.compile(rb"[^\x00]")
+
+def bitmap(rows, size):
+    """Bitset (a Python int) with the given row numbers set"""
+    bits = bytearray((size + 7) // 8)
+    for row in rows:
+        bits[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(bits, "little")
+
+def first_rows(mask, limit):
+    """Row numbers of the lowest `limit` set bits"""
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+    rows = []
+    # Skip the empty bytes at C speed, then walk the bits of the others
+    for match in NONZERO_BYTE.finditer(data):
+        byte = data[match.start()]
+        while byte:
+            lowest = byte & -byte
+            rows.append(match.start() * 8 + lowest.bit_length() - 1)
+            byte ^= lowest
+        if len(rows) >= limit:
+            break
+    return rows[:limit]
+
+# Fields the row order and the bitsets are built from, a change to one of them moves the shoe
+INDEXED_FIELDS = FACET_FIELDS + ["name", "sizes", "price", "rating"]
+
+def sort_key(shoe):
+    return (-(shoe.get("rating") or 0), shoe.get("price") or 0, str(shoe["_id"]))
+
+class CatalogSnapshot:
+    """
+    Column store of the catalog. Rows are ordered by rating (descending),
+    price and id, so the lowest set bits of a filter bitset are the best
+    rated matches, and `rating >= x` is a prefix of the rows. Every facet
+    value, EU size and price band has a bitset over the rows; a query ANDs
+    them together, a machine word at a time. Rows never move: single shoe
+    changes only flip their in-stock bit or drop them (see `apply`).
+    """
+
+    def __init__(self, shoes):
+        shoes.sort(key=sort_key)
+        self.shoes = shoes
+        self.size = len(shoes)
+        self.all = (1 << self.size) - 1
+        self.rows_by_id = {str(shoe["_id"]): row for row, shoe in enumerate(shoes)}
+
+        self.neg_ratings = array("d", (-(shoe.get("rating") or 0) for shoe in shoes))
+        self.prices = array("d", (shoe.get("price") or 0 for shoe in shoes))
+
+        rows_by_value = {field: {} for field in FACET_FIELDS}
+        rows_by_size = {}
+        in_stock_rows = []
+        for row, shoe in enumerate(shoes):
+            for field in FACET_FIELDS:
+                value = shoe.get(f"{field}_lc") or normalize_value(shoe.get(field) or "")
+                rows_by_value[field].setdefault(value, []).append(row)
+            for size in shoe.get("sizes") or []:
+                rows_by_size.setdefault(int(size), []).append(row)
+            if shoe.get("in_stock"):
+                in_stock_rows.append(row)
+
+        self.facets = {
+            field: {value: bitmap(rows, self.size) for value, rows in values.items()}
+            for field, values in rows_by_value.items()
+        }
+        self.sizes = {size: bitmap(rows, self.size) for size, rows in rows_by_size.items()}
+        self.in_stock = bitmap(in_stock_rows, self.size)
+
+        # Prices: equal-width bands for the interior of a range, sorted (price, id, row) for its
+        # edges and for the price orders
+        by_price = sorted((price, str(shoe["_id"]), row) for row, (price, shoe) in enumerate(zip(self.prices, shoes)))
+        self.min_price = by_price[0][0] if shoes else 0.0
+        self.max_price = by_price[-1][0] if shoes else 0.0
+        self.band_width = (self.max_price - self.min_price) / PRICE_BANDS or 1.0
+        self.band_prices = {}  # band -> sorted (price, id, row)
+        for entry in by_price:
+            self.band_prices.setdefault(self._band(entry[0]), []).append(entry)
+        self.bands = {
+            band: bitmap((row for _, _, row in entries), self.size) for band, entries in self.band_prices.items()
+        }
+
+        self.names = sorted((shoe.get("name_lc") or normalize_value(shoe.get("name") or ""), row) for row, shoe in enumerate(shoes))
+
+    def apply(self, change):
+        """
+        Apply one catalog event in place: a stock or display update replaces
+        the row's document and sets its in-stock bit, a deletion or a change
+        that would move the row drops it. Returns whether the snapshot is up
+        to date with the change, False when it needs a reload.
+        """
+        row = self.rows_by_id.get(str(change["_id"]))
+        if row is None:
+            # A new shoe needs a reload, an unknown deleted one is already absent
+            return bool(change.get("_deleted"))
+
+        bit = 1 << row
+        if not self.all & bit:
+            # Dropped by an earlier change
+            return False
+
+        current = self.shoes[row]
+        if not change.get("_deleted") and all(current.get(field) == change.get(field) for field in INDEXED_FIELDS):
+            shoe = {field: change[field] for field in CATALOG_PROJECTION if field in change}
+            shoe["_id"] = current["_id"]
+            self.shoes[row] = shoe
+            self.in_stock = self.in_stock | bit if shoe.get("in_stock") else self.in_stock & ~bit
+            return True
+
+        self.all &= ~bit
+        self.in_stock &= ~bit
+        return bool(change.get("_deleted"))
+
+    def _band(self, price):
+        return min(int((price - self.min_price) / self.band_width), PRICE_BANDS - 1)
+
+    def price_mask(self, price_min=None, price_max=None):
+        low = float("-inf") if price_min is None else float(price_min)
+        high = float("inf") if price_max is None else float(price_max)
+        if low > high or not self.size:
+            return 0
+
+        low_band = self._band(max(low, self.min_price))
+        high_band = self._band(min(high, self.max_price))
+
+        mask = 0
+        for band in range(low_band + 1, high_band):
+            mask |= self.bands.get(band, 0)
+
+        # Edge bands are split on the exact bounds
+        edge_rows = []
+        for band in {low_band, high_band}:
+            entries = self.band_prices.get(band, [])
+            start = bisect.bisect_left(entries, low, key=itemgetter(0))
+            end = bisect.bisect_right(entries, high, key=itemgetter(0))
+            edge_rows.extend(row for _, _, row in entries[start:end])
+        return mask | bitmap(edge_rows, self.size)
+
+    def filter(self, brand=None, category=None, color=None, gender=None, size=None,
+               price_min=None, price_max=None, in_stock_only=True, min_rating=None):
+        """Bitset of the rows matching the search_shoes criteria"""
+        mask = self.in_stock if in_stock_only else self.all
+        for field, value in (("brand", brand), ("category", category), ("color", color), ("gender", gender)):
+            if value and mask:
+                mask &= self.facets[field].get(normalize_value(value), 0)
+        if size and mask:
+            mask &= self.sizes.get(int(size), 0)
+        if min_rating is not None and mask:
+            mask &= (1 << bisect.bisect_right(self.neg_ratings, -float(min_rating))) - 1
+        if (price_min is not None or price_max is not None) and mask:
+            mask &= self.price_mask(price_min, price_max)
+        return mask
+
+    def after(self, mask, after):
+        """`mask` without the rows up to the decoded cursor `after`"""
+        rating, price, shoe_id = after
+        start = bisect.bisect_right(self.shoes, (-(rating or 0), price or 0, shoe_id), key=sort_key)
+        return mask >> start << start
+
+    def price_rows(self, mask, limit, descending=False, after=None):
+        """First `limit` rows of `mask` by price then id, walking the price bands in order"""
+        rows = []
+        for band in sorted(self.band_prices, reverse=descending):
+            candidates = mask & self.bands[band]
+            if not candidates:
+                continue
+
+            entries = self.band_prices[band]
+            if after is not None:
+                key = (after[0] or 0, after[1])
+                if descending:
+                    entries = entries[:bisect.bisect_left(entries, key, key=itemgetter(0, 1))]
+                else:
+                    entries = entries[bisect.bisect_right(entries, key, key=itemgetter(0, 1)):]
+
+            candidates = set(first_rows(candidates, candidates.bit_count()))
+            for _, _, row in (reversed(entries) if descending else entries):
+                if row in candidates:
+                    rows.append(row)
+                    if len(rows) >= limit:
+                        return rows
+        return rows
+
+    def page(self, mask, limit, sort="rating", after=None):
+        """First `limit` shoes of `mask` as (shoes, has_more, next_cursor), like catalog_pages.find_page"""
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        if sort == "rating":
+            if after is not None:
+                mask = self.after(mask, after)
+            rows = first_rows(mask, limit + 1)
+        else:
+            rows = self.price_rows(mask, limit + 1, descending=sort == "price_desc", after=after)
+
+        has_more = len(rows) > limit
+        shoes = [shoe_card(self.shoes[row]) for row in rows[:limit]]
+        return shoes, has_more, encode_cursor(shoes[-1], sort) if has_more else None
+
+    def name_mask(self, name):
+        """Bitset of the shoes whose name starts with `name`, or contains it when none does"""
+        prefix = normalize_value(name)
+        start = bisect.bisect_left(self.names, (prefix, -1))
+        rows = []
+        for name_lc, row in self.names[start:]:
+            if not name_lc.startswith(prefix):
+                break
+            rows.append(row)
+        if not rows:
+            rows = [row for name_lc, row in self.names if prefix in name_lc]
+        return bitmap(rows, self.size)
+
+class CatalogEngine:
+    """
+    Optional in-process catalog answering the tool queries from a
+    CatalogSnapshot instead of MongoDB. The snapshot is loaded once, then
+    reloaded in the background every `ttl` seconds, or when a change cannot
+    be applied in place (new shoes, moved rows, catalog-wide changes), while
+    queries keep using the previous one.
+    """
+
+    def __init__(self, db, ttl=300, min_rating=4.0):
+        self.db = db
+        self.ttl = ttl
+        self.min_rating = min_rating
+
+        self._snapshot = None
+        self._loaded_at = 0.0
+        self._stale = False
+        self._reloading = False
+        self._pending = []  # changes received while a load is running, replayed on its snapshot
+        self._lock = threading.Lock()
+        self._first_load = threading.Lock()
+
+        self.queries = 0
+        self.reloads = 0
+        self.applied = 0
+        self.last_reload_ms = None
+
+    def _load(self):
+        started = time.perf_counter()
+        shoes = []
+        for shoe in self.db.shoes.find({}, CATALOG_PROJECTION, batch_size=5000):
+            shoe["_id"] = str(shoe["_id"])
+            shoes.append(shoe)
+
+        snapshot = CatalogSnapshot(shoes)
+        with self._lock:
+            # The collection was read before these changes may have happened
+            for change in self._pending:
+                if not snapshot.apply(change):
+                    self._stale = True
+            self._pending = []
+
+            self._snapshot = snapshot
+            self._loaded_at = time.monotonic()
+            self._reloading = False
+            self.reloads += 1
+            self.last_reload_ms = round((time.perf_counter() - started) * 1000, 2)
+        return snapshot
+
+    def _reload_in_background(self):
+        try:
+            self._load()
+        except Exception as e:
+            print(f"❌ Catalog engine reload failed: {e}")
+            with self._lock:
+                self._reloading = False
+
+    def snapshot(self):
+        """The current snapshot; the first call loads it, later ones trigger background reloads"""
+        with self._lock:
+            snapshot = self._snapshot
+            self.queries += 1
+            expired = self._stale or time.monotonic() - self._loaded_at >= self.ttl
+            if snapshot is not None and expired and not self._reloading:
+                # Changes published while reloading mark the new snapshot stale again
+                self._stale = False
+                self._reloading = True
+                threading.Thread(target=self._reload_in_background, name="catalog-engine", daemon=True).start()
+
+        if snapshot is not None:
+            return snapshot
+
+        # Concurrent first queries (and the warm-up) share one load
+        with self._first_load:
+            return self._snapshot or self._load()
+
+    def invalidate(self, version=None, change=None):
+        """Catalog event subscriber: apply a shoe change in place, or reload on the next query"""
+        with self._lock:
+            if change is None:
+                self._stale = True
+                return
+
+            if self._reloading or self._snapshot is None:
+                self._pending.append(change)
+                if len(self._pending) > 1000:
+                    self._pending = []
+                    self._stale = True
+
+            if self._snapshot is not None:
+                if self._snapshot.apply(change):
+                    self.applied += 1
+                else:
+                    self._stale = True
+
+    def search(self, limit=10, after=None, sort="rating", **criteria):
+        """search_shoes criteria; returns (shoes, has_more, next_cursor)"""
+        snapshot = self.snapshot()
+        return snapshot.page(snapshot.filter(**criteria), limit, sort, after)
+
+    def availability(self, shoe_name=None, size=None, limit=10, after=None):
+        """check_shoe_availability; returns (shoes, has_more, next_cursor)"""
+        snapshot = self.snapshot()
+        mask = snapshot.filter(size=size)
+        if shoe_name and mask:
+            mask &= snapshot.name_mask(shoe_name)
+        return snapshot.page(mask, limit, after=after)
+
+    def top(self, category=None, gender=None, brand=None, color=None, limit=8):
+        """Same contract as RecommendationLeaderboard.top"""
+        shoes, _, _ = self.search(limit=limit, category=category, gender=gender, brand=brand, color=color,
+                                  min_rating=self.min_rating)
+        return shoes
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "ttl": self.ttl,
+            "shoes": snapshot.size if snapshot else None,
+            "queries": self.queries,
+            "reloads": self.reloads,
+            "applied_changes": self.applied,
+            "last_reload_ms": self.last_reload_ms,
+            "age_seconds": round(time.monotonic() - self._loaded_at, 1) if snapshot else None,
+        }
@@ -0,0 +1,83 @@
+import threading
+
+class CatalogEvents:
+    """
+    Monotonically increasing catalog version with subscribers notified on change.
+    Subscribers are called as `callback(version, change)` where `change` is the
+    changed shoe document (`{"_id": ..., "_deleted": True}` for a deletion), or
+    None when any part of the catalog may have changed.
+
+    With `debounce`, changes are batched and delivered once per window under a
+    single version, so a burst of stock updates or an import costs the caches
+    one invalidation instead of one per document. A batch larger than
+    `max_batch` is delivered as one catalog-wide change.
+    """
+
+    def __init__(self, debounce=0.0, max_batch=100):
+        self.debounce = debounce
+        self.max_batch = max_batch
+        self.version = 0
+        self.batches = 0
+        self.changes = 0
+        self._subscribers = []
+        self._pending = []
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def publish(self, change=None):
+        """Notify the subscribers of a change, at the end of the current window when debouncing"""
+        if not self.debounce:
+            return self._notify([change])
+
+        with self._lock:
+            self._pending.append(change)
+            if self._timer is None:
+                self._timer = threading.Timer(self.debounce, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Deliver the pending changes now"""
+        with self._lock:
+            changes, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if changes:
+            return self._notify(changes)
+
+    def _notify(self, changes):
+        """Bump the catalog version once and pass every change to the subscribers"""
+        if None in changes or len(changes) > self.max_batch:
+            changes = [None]
+        else:
+            # The last change of a shoe wins
+            changes = list({str(change["_id"]): change for change in changes}.values())
+
+        with self._lock:
+            self.version += 1
+            self.batches += 1
+            self.changes += len(changes)
+            version = self.version
+
+        for callback in self._subscribers:
+            for change in changes:
+                try:
+                    callback(version, change)
+                except Exception as e:
+                    print(f"❌ Catalog subscriber {callback} failed: {e}")
+
+        return version
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": self.version,
+                "debounce_seconds": self.debounce,
+                "batches": self.batches,
+                "changes": self.changes,
+                "pending": len(self._pending),
+            }
@@ -0,0 +1,74 @@
+import json
+import base64
+from bson import ObjectId
+from pymongo import DESCENDING
+from database.schema import SHOE_CARD_PROJECTION, SHOE_SORTS
+
+# Upper bound on the shoes returned by any single catalog read
+MAX_PAGE_SIZE = 50
+
+def encode_cursor(shoe, sort="rating"):
+    """Opaque token pointing just after `shoe` in the `sort` order"""
+    key = [sort] + [str(shoe["_id"]) if field == "_id" else shoe.get(field) for field, _ in SHOE_SORTS[sort]]
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(token, sort="rating"):
+    """Sort key values from a cursor token, raising ValueError when it is not one for `sort`"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        fields = [field for field, _ in SHOE_SORTS[sort]]
+        if key[0] != sort or len(key) != len(fields) + 1:
+            raise ValueError
+        return tuple(
+            str(value) if field == "_id" else None if value is None else float(value)
+            for field, value in zip(fields, key[1:])
+        )
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def after_value(field, direction, value):
+    """Condition for `field` being strictly after `value`; missing values sort lowest"""
+    if direction == DESCENDING:
+        return {"$or": [{field: {"$lt": value}}, {field: None}]} if value is not None else None
+    return {field: {"$gt": value}} if value is not None else {field: {"$ne": None}}
+
+def after_cursor(query_filter, after, sort="rating"):
+    """`query_filter` restricted to the shoes sorted after the decoded cursor `after`"""
+    after = [ObjectId(value) if field == "_id" and ObjectId.is_valid(value) else value
+             for (field, _), value in zip(SHOE_SORTS[sort], after)]
+
+    # Keyset: same values on the first sort fields and after the cursor on the next one
+    branches = []
+    for index, (field, direction) in enumerate(SHOE_SORTS[sort]):
+        condition = after_value(field, direction, after[index])
+        if condition is not None:
+            equal = {previous: after[position] for position, (previous, _) in enumerate(SHOE_SORTS[sort][:index])}
+            branches.append({"$and": [equal, condition]} if equal else condition)
+
+    keyset = {"$or": branches}
+    return {"$and": [query_filter, keyset]} if query_filter else keyset
+
+def find_page(collection, query_filter, limit, after=None, sort="rating", projection=SHOE_CARD_PROJECTION):
+    """
+    One page of shoes in the `sort` order: returns (shoes, has_more,
+    next_cursor). One extra document is read to know whether there is more,
+    in a single batch.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    if after is not None:
+        query_filter = after_cursor(query_filter, after, sort)
+
+    shoes = list(
+        collection.find(query_filter, projection)
+        .sort(SHOE_SORTS[sort])
+        .limit(limit + 1)
+        .batch_size(limit + 1)
+    )
+    has_more = len(shoes) > limit
+    shoes = shoes[:limit]
+
+    # Convert ObjectId to string
+    for shoe in shoes:
+        shoe["_id"] = str(shoe["_id"])
+
+    return shoes, has_more, encode_cursor(shoes[-1], sort) if has_more else None
@@ -0,0 +1,149 @@
+import time
+import threading
+from pymongo.errors import OperationFailure
+
+# "The $changeStream stage is only supported on replica sets"
+CHANGE_STREAMS_UNSUPPORTED = 40573
+# ChangeStreamHistoryLost (the resume token left the oplog) and ChangeStreamFatalError:
+# the stream cannot be resumed and is reopened from the current time
+CHANGE_STREAM_UNRESUMABLE = {280, 286}
+
+class CatalogWatcher:
+    """
+    Background watcher on the shoes collection publishing every change to
+    CatalogEvents, so the in-process catalog caches drop stale stock, price
+    and rating data as soon as MongoDB has it. Uses a change stream, or on a
+    standalone server polls a fingerprint of the collection every
+    `poll_interval` seconds and publishes a catalog-wide change.
+    """
+
+    def __init__(self, collection, events, poll_interval=15.0, retry_interval=5.0):
+        self.collection = collection
+        self.events = events
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+
+        self.mode = None
+        self.changes = 0
+        self.errors = 0
+        self.last_change_at = None
+
+        self._resume_token = None
+        self._watching = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="catalog-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _publish(self, change):
+        self.changes += 1
+        self.last_change_at = time.time()
+        self.events.publish(change)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._watch()
+            except (OperationFailure, NotImplementedError) as e:
+                if isinstance(e, OperationFailure) and e.code in CHANGE_STREAM_UNRESUMABLE:
+                    self._restart(e)
+                    continue
+                if isinstance(e, OperationFailure) and e.code != CHANGE_STREAMS_UNSUPPORTED:
+                    self._retry(e)
+                    continue
+                print("ℹ️ Change streams unavailable, polling the catalog for changes")
+                self._poll()
+                return
+            except Exception as e:
+                self._retry(e)
+
+    def _retry(self, error):
+        self.errors += 1
+        print(f"❌ Catalog watcher error: {error}. Retrying in {self.retry_interval}s")
+        self._stop.wait(self.retry_interval)
+        if self._watching:
+            # Changes may have been missed while disconnected
+            self._watching = False
+            self._publish(None)
+
+    def _restart(self, error):
+        self.errors += 1
+        print(f"❌ Catalog change stream lost: {error}. Reopening in {self.retry_interval}s")
+        self._stop.wait(self.retry_interval)
+        # Changes since the resume token are unknown, every cache has to start over
+        self._resume_token = None
+        self._watching = False
+        self._publish(None)
+
+    def _watch(self):
+        self.mode = "change_stream"
+        with self.collection.watch(
+            full_document="updateLookup", resume_after=self._resume_token, max_await_time_ms=1000
+        ) as stream:
+            self._watching = True
+            while not self._stop.is_set() and stream.alive:
+                change = stream.try_next()
+                if change is None:
+                    continue
+                self._resume_token = stream.resume_token
+                self._handle(change)
+
+    def _handle(self, change):
+        operation = change["operationType"]
+        if operation in ("insert", "update", "replace"):
+            shoe = change.get("fullDocument")
+            if shoe is None:
+                # Deleted before the lookup ran
+                self._publish({"_id": str(change["documentKey"]["_id"]), "_deleted": True})
+            else:
+                self._publish({**shoe, "_id": str(shoe["_id"])})
+        elif operation == "delete":
+            self._publish({"_id": str(change["documentKey"]["_id"]), "_deleted": True})
+        else:
+            # drop, rename or invalidate: the stream ends and is reopened from scratch
+            self._resume_token = None
+            self._publish(None)
+
+    def _fingerprint(self):
+        """
+        Value that changes whenever the stock, price or rating data of the
+        catalog changes. A single aggregate, not dbHash, which takes a lock
+        and hashes every document on each poll.
+        """
+        groups = list(self.collection.aggregate([{"$group": {
+            "_id": None,
+            "count": {"$sum": 1},
+            "in_stock": {"$sum": {"$cond": ["$in_stock", 1, 0]}},
+            "price": {"$sum": "$price"},
+            "rating": {"$sum": "$rating"},
+            "max_id": {"$max": "$_id"},
+        }}]))
+        return groups[0] if groups else None
+
+    def _poll(self):
+        self.mode = "polling"
+        fingerprint = None
+        while not self._stop.is_set():
+            try:
+                current = self._fingerprint()
+                if fingerprint is not None and current != fingerprint:
+                    self._publish(None)
+                fingerprint = current
+            except Exception as e:
+                self.errors += 1
+                print(f"❌ Catalog polling error: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "changes": self.changes,
+            "errors": self.errors,
+            "catalog_version": self.events.version,
+            "seconds_since_change": round(time.time() - self.last_change_at, 1) if self.last_change_at else None,
+        }
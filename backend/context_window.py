@@ -0,0 +1,163 @@
+import json
+import threading
+
+def estimate_tokens(message):
+    """Approximate the prompt tokens used by a message (~4 characters per token)"""
+    chars = len(message.get("content") or "")
+    for tool_call in message.get("tool_calls") or []:
+        chars += len(tool_call["function"]["name"]) + len(tool_call["function"]["arguments"] or "")
+    # Per-message overhead for role and separators
+    return 4 + chars // 4
+
+def estimate_prompt_tokens(messages, completion_tokens=500):
+    """Approximate the tokens a completion request will use, including its reply"""
+    return sum(estimate_tokens(message) for message in messages) + completion_tokens
+
+def split_turns(conversation_history):
+    """Split a history (without the system prompt) into turns starting at each user message"""
+    turns = []
+    for message in conversation_history:
+        if message.get("role") == "user" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+def compress_tool_message(message, max_chars=300):
+    """Shrink a stale tool result down to its scalar fields"""
+    content = message.get("content") or ""
+    if len(content) <= max_chars:
+        return message
+
+    try:
+        parsed = json.loads(content)
+        compact = {key: value for key, value in parsed.items() if not isinstance(value, (list, dict))}
+        compact["compressed"] = True
+        content = json.dumps(compact, separators=(",", ":"))
+    except (ValueError, AttributeError):
+        content = content[:max_chars] + "..."
+
+    return {**message, "content": content}
+
+def summarize_turn(turn):
+    """Describe a dropped turn in one short line for the rolling summary"""
+    parts = []
+    for message in turn:
+        role = message.get("role")
+        if role == "user":
+            parts.append(f"Customer: {(message.get('content') or '')[:120]}")
+        elif role == "assistant" and message.get("tool_calls"):
+            for tool_call in message["tool_calls"]:
+                parts.append(f"Looked up {tool_call['function']['name']}({tool_call['function']['arguments']})")
+        elif role == "assistant" and message.get("content"):
+            parts.append(f"Amine: {message['content'][:120]}")
+    return " | ".join(parts)
+
+class ContextWindow:
+    """
+    Keeps the prompt sent to the model within a token budget.
+    The system prompt and the last `keep_turns` turns are kept verbatim,
+    stale tool results are compressed and older turns are folded into a
+    rolling summary stored on the session.
+    """
+
+    def __init__(self, budget_tokens=6000, keep_turns=6, summary_tokens=300):
+        self.budget_tokens = budget_tokens
+        self.keep_turns = keep_turns
+        self.summary_tokens = summary_tokens
+
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.turns_summarized = 0
+        self.last_turn = None
+
+    def summary_message(self, session):
+        summary = session.get("context_summary")
+        if not summary:
+            return None
+        return {
+            "role": "system",
+            "content": "Summary of the earlier conversation:\n" + "\n".join(summary)
+        }
+
+    def messages(self, session):
+        """Build the messages to send to the model for a session"""
+        conversation_history = session["conversation_history"]
+        summary_message = self.summary_message(session)
+        if summary_message is None:
+            return conversation_history
+        return [conversation_history[0], summary_message] + conversation_history[1:]
+
+    def count_tokens(self, session):
+        return sum(estimate_tokens(message) for message in self.messages(session))
+
+    def fit(self, session):
+        """
+        Trim the session's history in place before a new model call.
+        Call once the new user message has been appended; returns the turn's metrics.
+        """
+        conversation_history = session["conversation_history"]
+        tokens_before = self.count_tokens(session)
+
+        system_message = conversation_history[0]
+        turns = split_turns(conversation_history[1:])
+
+        # Tool results only matter for the turn that produced them
+        for turn in turns[:-1]:
+            turn[:] = [
+                compress_tool_message(message) if message.get("role") == "tool" else message
+                for message in turn
+            ]
+
+        summary = list(session.get("context_summary") or [])
+        summarized = 0
+        system_tokens = estimate_tokens(system_message)
+        turn_tokens = [sum(estimate_tokens(message) for message in turn) for turn in turns]
+
+        def prompt_tokens():
+            summary_tokens = 4 + sum(len(line) for line in summary) // 4 if summary else 0
+            return system_tokens + summary_tokens + sum(turn_tokens)
+
+        while len(turns) > 1 and (len(turns) > self.keep_turns or prompt_tokens() > self.budget_tokens):
+            summary.append(summarize_turn(turns.pop(0)))
+            turn_tokens.pop(0)
+            summarized += 1
+
+        # Keep the summary itself bounded, oldest lines go first
+        while len(summary) > 1 and sum(len(line) for line in summary) // 4 > self.summary_tokens:
+            summary.pop(0)
+
+        conversation_history[:] = [system_message] + [message for turn in turns for message in turn]
+        if summary:
+            session["context_summary"] = summary
+
+        tokens_after = self.count_tokens(session)
+        metrics = {
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "tokens_saved": tokens_before - tokens_after,
+            "turns_summarized": summarized,
+        }
+
+        with self._lock:
+            self.turns += 1
+            self.tokens_before += tokens_before
+            self.tokens_after += tokens_after
+            self.turns_summarized += summarized
+            self.last_turn = metrics
+
+        return metrics
+
+    def stats(self):
+        with self._lock:
+            return {
+                "budget_tokens": self.budget_tokens,
+                "keep_turns": self.keep_turns,
+                "turns": self.turns,
+                "tokens_before": self.tokens_before,
+                "tokens_after": self.tokens_after,
+                "tokens_saved": self.tokens_before - self.tokens_after,
+                "turns_summarized": self.turns_summarized,
+                "last_turn": self.last_turn,
+            }
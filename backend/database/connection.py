@@ -0,0 +1,131 @@
+import os
+import threading
+from pymongo import MongoClient, monitoring
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool usage collected from PyMongo's pool events"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open -= 1
+
+    def connection_checked_out(self, event):
+        # `duration` (PyMongo 4.7+) is the time spent waiting for a connection
+        wait = getattr(event, "duration", None) or 0.0
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+
+    # Events the metrics do not need
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "open": self.open,
+                "checked_out": self.checked_out,
+                "peak_checked_out": self.peak_checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "avg_wait_ms": round(self.wait_total / self.checkouts * 1000, 2) if self.checkouts else None,
+                "max_wait_ms": round(self.wait_max * 1000, 2),
+            }
+
+pool_metrics = PoolMetrics()
+
+_client = None
+_client_lock = threading.Lock()
+
+def client_options():
+    """MongoClient settings from the environment"""
+    options = {
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", 50)),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", 0)),
+        "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 300000)),
+        "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000)),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000)),
+        "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000)),
+        "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 20000)),
+        "readPreference": os.getenv("MONGO_READ_PREFERENCE", "primary"),
+        "appname": "techno-shoe",
+    }
+    compressors = os.getenv("MONGO_COMPRESSORS", "zlib")
+    if compressors:
+        options["compressors"] = compressors
+    return options
+
+def get_client():
+    """The process-wide MongoClient, created on first use (it connects in the background)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(
+                    os.getenv("CONNECTION_STRING"),
+                    event_listeners=[pool_metrics],
+                    **client_options()
+                )
+    return _client
+
+def ping(client=None):
+    try:
+        (client or get_client()).admin.command('ping')
+    except Exception as e:
+        raise Exception(f"❌ Could not connect to MongoDB: {e}")
+
+def get_database(name=None, check=False):
+    """Return the application database, pinging the cluster first when `check` is set"""
+    client = get_client()
+    if check:
+        ping(client)
+        print("✅ Connected to MongoDB successfully!")
+    return client[name or os.getenv("DB_NAME", "techno_shoes")]
+
+def pool_stats():
+    stats = pool_metrics.stats()
+    stats["max_pool_size"] = client_options()["maxPoolSize"]
+    return stats
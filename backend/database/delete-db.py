@@ -1,23 +1,13 @@
-import os
-from pymongo import MongoClient
 from dotenv import load_dotenv
+from connection import get_database
 
 # Load environment variables
 load_dotenv()
 
 def get_db_connection():
     """Establish connection to MongoDB and return database object"""
-    client = MongoClient(os.getenv("CONNECTION_STRING"))
-    
     # Check if cluster is reachable
-    try:
-        client.admin.command('ping')
-        print("✅ Pinged your cluster. Connection successful!")
-    except Exception as e:
-        raise Exception(f"❌ Could not connect to cluster: {e}")
-
-    db_name = os.getenv("DB_NAME")
-    return client[db_name]
+    return get_database(check=True)
 
 def delete_all_data(db):
     """Delete all documents from all collections in the database"""
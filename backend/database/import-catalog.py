@@ -0,0 +1,183 @@
+import os
+import csv
+import json
+import time
+import argparse
+from datetime import datetime
+from pymongo import UpdateOne
+from schema import NORMALIZED_FIELDS, normalize_shoe, ensure_shoe_indexes
+from connection import get_database
+
+# Catalog fields read from the import file, with their types
+FIELD_TYPES = {
+    "sku": str,
+    "name": str,
+    "brand": str,
+    "category": str,
+    "color": str,
+    "gender": str,
+    "image": str,
+    "price": float,
+    "rating": float,
+}
+REQUIRED_FIELDS = ["sku", "name", "brand", "price"]
+
+# Optional fields cleared from the stored shoe when a re-imported record no longer has them
+CLEARABLE_FIELDS = [field for field in FIELD_TYPES if field not in REQUIRED_FIELDS] + [
+    f"{field}_lc" for field in NORMALIZED_FIELDS
+]
+
+def parse_sizes(value):
+    """Sizes from a JSON list or a "40|41|42" / "40,41,42" string"""
+    if isinstance(value, list):
+        return [int(size) for size in value]
+    value = str(value or "").strip()
+    if value.startswith("["):
+        return [int(size) for size in json.loads(value)]
+    return [int(size) for size in value.replace(",", "|").split("|") if size.strip()]
+
+def parse_bool(value, default=True):
+    """Boolean from an import value; a missing or blank cell gives `default`"""
+    if isinstance(value, bool):
+        return value
+    if value is None or str(value).strip() == "":
+        return default
+    return str(value).strip().lower() in ("1", "true", "yes", "y")
+
+def to_shoe(record):
+    """Build a catalog document from an import record, raising ValueError when it is unusable"""
+    shoe = {}
+    for field, field_type in FIELD_TYPES.items():
+        value = record.get(field)
+        if value is None or value == "":
+            continue
+        shoe[field] = field_type(value.strip() if isinstance(value, str) else value)
+
+    missing = [field for field in REQUIRED_FIELDS if field not in shoe]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+
+    shoe["sizes"] = parse_sizes(record.get("sizes"))
+    shoe["in_stock"] = parse_bool(record.get("in_stock"))
+    return normalize_shoe(shoe)
+
+def read_records(path, file_format):
+    """Stream records from a CSV or JSONL file without loading it in memory"""
+    with open(path, newline="", encoding="utf-8") as f:
+        if file_format == "csv":
+            yield from csv.DictReader(f)
+        else:
+            # Lines are parsed by the caller so one bad line only skips that record
+            for line in f:
+                if line.strip():
+                    yield line
+
+def load_checkpoint(checkpoint_path, source_path):
+    """Number of records already imported from this exact file, 0 when starting over"""
+    if not os.path.exists(checkpoint_path):
+        return 0
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+
+    stat = os.stat(source_path)
+    if checkpoint.get("size") != stat.st_size or checkpoint.get("mtime") != stat.st_mtime:
+        print("ℹ️ Source file changed since the last run - starting over")
+        return 0
+    return checkpoint["records"]
+
+def save_checkpoint(checkpoint_path, source_path, records):
+    stat = os.stat(source_path)
+    temporary_path = checkpoint_path + ".tmp"
+    with open(temporary_path, "w") as f:
+        json.dump({"source": source_path, "size": stat.st_size, "mtime": stat.st_mtime, "records": records}, f)
+    os.replace(temporary_path, checkpoint_path)
+
+def write_batch(collection, shoes, imported_at):
+    """Upsert a batch of shoes keyed by SKU; unchanged shoes and replayed batches are not modified"""
+    operations = []
+    for shoe in shoes:
+        update = {"$set": shoe, "$setOnInsert": {"created_at": imported_at}}
+        removed = {field: "" for field in CLEARABLE_FIELDS if field not in shoe}
+        if removed:
+            update["$unset"] = removed
+        operations.append(UpdateOne({"sku": shoe["sku"]}, update, upsert=True))
+    result = collection.bulk_write(operations, ordered=False)
+    return result.upserted_count, result.modified_count
+
+def import_catalog(db, path, file_format=None, batch_size=1000, checkpoint_path=None, restart=False):
+    """Import a catalog file into the shoes collection, resuming from the checkpoint when there is one"""
+    file_format = file_format or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    checkpoint_path = checkpoint_path or path + ".checkpoint.json"
+
+    if restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    resume_from = load_checkpoint(checkpoint_path, path)
+    if resume_from:
+        print(f"🔄 Resuming after {resume_from} records")
+
+    ensure_shoe_indexes(db.shoes)
+
+    imported_at = datetime.utcnow()
+    started = time.perf_counter()
+    stats = {"records": resume_from, "upserted": 0, "modified": 0, "invalid": 0}
+    batch = {}  # sku -> shoe, a SKU repeated within a batch keeps its last record
+
+    def flush():
+        upserted, modified = write_batch(db.shoes, list(batch.values()), imported_at)
+        stats["upserted"] += upserted
+        stats["modified"] += modified
+        batch.clear()
+        save_checkpoint(checkpoint_path, path, stats["records"])
+
+        elapsed = time.perf_counter() - started
+        rate = (stats["records"] - resume_from) / elapsed if elapsed else 0
+        print(f"  {stats['records']} records, {rate:,.0f} records/s")
+
+    for position, record in enumerate(read_records(path, file_format)):
+        if position < resume_from:
+            continue
+        stats["records"] += 1
+
+        try:
+            shoe = to_shoe(json.loads(record) if isinstance(record, str) else record)
+            batch[shoe["sku"]] = shoe
+        except (ValueError, TypeError, AttributeError) as e:
+            stats["invalid"] += 1
+            if stats["invalid"] <= 10:
+                print(f"⚠️ Skipping record {position + 1}: {e}")
+            continue
+
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+
+    # Finished, the next run imports the file from the start
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    stats["records_per_second"] = round((stats["records"] - resume_from) / stats["seconds"]) if stats["seconds"] else None
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a CSV/JSONL catalog into the shoes collection (upserts by SKU)")
+    parser.add_argument("path", help="catalog file (.csv or .jsonl)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="file format, guessed from the extension by default")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--checkpoint", help="checkpoint file, <path>.checkpoint.json by default")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and import the whole file")
+    args = parser.parse_args()
+
+    try:
+        db = get_database(check=True)
+        stats = import_catalog(db, args.path, args.format, args.batch_size, args.checkpoint, args.restart)
+        print(f"\n🎉 Imported {stats['records']} records in {stats['seconds']}s "
+              f"({stats['records_per_second']} records/s): {stats['upserted']} new, "
+              f"{stats['modified']} updated, {stats['invalid']} skipped")
+    except Exception as e:
+        print(f"❌ Catalog import failed: {e} - run again to resume from the last checkpoint")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,9 @@
-import os
-from pymongo import MongoClient
 from dotenv import load_dotenv
 from typing import List, Dict
 import random
 from datetime import datetime
+from schema import normalize_shoe, ensure_shoe_indexes, backfill_normalized_fields
+from connection import get_database
 
 # Load environment variables
 load_dotenv()
@@ -17,17 +17,8 @@ reebok = "https://www.reebok.eu/cdn/shop/files/22253063_52160247_800.webp?v=1744
 
 def get_db_connection():
     """Establish connection to MongoDB and return database object"""
-    client = MongoClient(os.getenv("CONNECTION_STRING"))
-    
     # Check if cluster is reachable
-    try:
-        client.admin.command('ping')
-        print("✅ Pinged your cluster. Connection successful!")
-    except Exception as e:
-        raise Exception(f"❌ Could not connect to cluster: {e}")
-
-    db_name = os.getenv("DB_NAME")
-    return client[db_name]
+    return get_database(check=True)
 
 def generate_simple_shoes_data() -> List[Dict]:
     """Generate a simple, clean dataset of shoes with European sizes and DH prices."""
@@ -52,6 +43,7 @@ def generate_simple_shoes_data() -> List[Dict]:
         category = random.choice(categories)
         
         shoe = {
+            "sku": f"TS-{i+1:05d}",
             "name": f"{brand} {category} {i+1}",
             "brand": brand,
             "category": category,
@@ -64,12 +56,12 @@ def generate_simple_shoes_data() -> List[Dict]:
             "image": brand_images[brand]
         }
         
-        shoes_data.append(shoe)
+        shoes_data.append(normalize_shoe(shoe))
     
     return shoes_data
 
 def initialize_shoes_collection(db) -> None:
-    """Initialize the shoes collection with sample data if it doesn't exist"""
+    """Initialize the shoes collection with sample data if it doesn't exist, and its indexes"""
     if "shoes" not in db.list_collection_names():
         print("🔄 Creating and populating 'shoes' collection...")
         shoes_data = generate_simple_shoes_data()
@@ -94,6 +86,15 @@ def initialize_shoes_collection(db) -> None:
             print(f"❌ Error creating shoes collection: {e}")
     else:
         print("ℹ️ 'shoes' collection already exists - skipping initialization")
+        updated = backfill_normalized_fields(db.shoes)
+        if updated:
+            print(f"🔄 Added normalized search fields to {updated} existing shoes")
+
+    try:
+        ensure_shoe_indexes(db.shoes)
+        print("✅ Catalog indexes are in place")
+    except Exception as e:
+        print(f"❌ Error creating catalog indexes: {e}")
 
 def initialize_customers_collection(db) -> None:
     """Initialize the customers collection with schema validation if it doesn't exist"""
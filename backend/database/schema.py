@@ -0,0 +1,74 @@
+from pymongo import ASCENDING, DESCENDING, TEXT, UpdateOne
+
+# Text fields stored a second time in lowercase (`brand_lc`, ...) so catalog
+# queries can use plain equality/prefix matches that are served by an index
+NORMALIZED_FIELDS = ["name", "brand", "category", "color", "gender"]
+
+SHOE_INDEXES = [
+    [("brand_lc", ASCENDING), ("category_lc", ASCENDING), ("price", ASCENDING)],
+    [("category_lc", ASCENDING), ("gender_lc", ASCENDING), ("price", ASCENDING)],
+    [("color_lc", ASCENDING), ("price", ASCENDING)],
+    [("gender_lc", ASCENDING), ("price", ASCENDING)],
+    [("sizes", ASCENDING)],
+    [("name_lc", ASCENDING)],
+    [("name", TEXT)],
+    [("rating", DESCENDING), ("price", ASCENDING), ("_id", ASCENDING)],
+    [("price", ASCENDING), ("_id", ASCENDING)],
+]
+
+# Fields of a shoe shown on the frontend card and summarized for the model
+SHOE_CARD_FIELDS = ["_id", "sku", "name", "brand", "category", "color", "gender", "price", "sizes", "rating", "in_stock", "image"]
+SHOE_CARD_PROJECTION = {field: 1 for field in SHOE_CARD_FIELDS}
+
+# Card fields plus the normalized ones, for the in-memory copies of the catalog
+CATALOG_PROJECTION = {field: 1 for field in SHOE_CARD_FIELDS + [f"{field}_lc" for field in NORMALIZED_FIELDS]}
+
+# Orders of catalog results (best rated first by default), also the keys of the pagination cursors
+SHOE_SORTS = {
+    "rating": [("rating", DESCENDING), ("price", ASCENDING), ("_id", ASCENDING)],
+    "price_asc": [("price", ASCENDING), ("_id", ASCENDING)],
+    "price_desc": [("price", DESCENDING), ("_id", DESCENDING)],
+}
+
+def normalize_value(value):
+    """Normalized form of a facet value used for storage and lookups"""
+    return str(value).strip().lower()
+
+def normalize_shoe(shoe):
+    """Add the normalized lowercase fields to a shoe document"""
+    for field in NORMALIZED_FIELDS:
+        if shoe.get(field) is not None:
+            shoe[f"{field}_lc"] = normalize_value(shoe[field])
+    return shoe
+
+def shoe_card(shoe):
+    """Copy of a shoe document with only the card fields"""
+    return {field: shoe[field] for field in SHOE_CARD_FIELDS if field in shoe}
+
+def ensure_shoe_indexes(collection):
+    """Create the catalog indexes (no-op for the ones that already exist)"""
+    for keys in SHOE_INDEXES:
+        collection.create_index(keys)
+
+    # Catalog imports upsert by SKU, shoes stored without one are left out
+    collection.create_index("sku", unique=True, partialFilterExpression={"sku": {"$type": "string"}})
+
+def backfill_normalized_fields(collection, batch_size=500):
+    """Populate the normalized fields on documents stored before they existed"""
+    missing = {"$or": [{f"{field}_lc": {"$exists": False}} for field in NORMALIZED_FIELDS]}
+    projection = {field: 1 for field in NORMALIZED_FIELDS}
+
+    updated = 0
+    operations = []
+    for shoe in collection.find(missing, projection):
+        normalized = {key: value for key, value in normalize_shoe(dict(shoe)).items() if key.endswith("_lc")}
+        operations.append(UpdateOne({"_id": shoe["_id"]}, {"$set": normalized}))
+
+        if len(operations) >= batch_size:
+            updated += collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+
+    if operations:
+        updated += collection.bulk_write(operations, ordered=False).modified_count
+
+    return updated
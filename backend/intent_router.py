@@ -0,0 +1,159 @@
+import re
+import threading
+from leaderboard import match_facets
+
+# Buying/browsing cues, from the keyword lists prototyped in tests/AI-Agent.py
+SEARCH_CUES = [
+    "i want", "i need", "show me", "looking for", "do you have", "can i buy",
+    "i'll take", "where can i", "i need these", "find me", "any"
+]
+RECOMMEND_CUES = ["recommend", "best", "top rated", "top-rated", "popular", "suggest"]
+CATALOG_CUES = ["what brands", "which brands", "what categories", "what colors", "what do you have", "what do you sell"]
+
+# Messages that refine or refer back to the conversation need the model
+FOLLOW_UP_STARTS = ("and ", "also ", "but ", "what about", "how about", "in ", "the ", "this ", "that ", "it ")
+CONTACT_PATTERNS = [
+    r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b',
+    r'\(\d{3}\)\s?\d{3}[-.]?\d{4}',
+    r'\+\d{1,3}\s?\d{3}[-.]?\d{3}[-.]?\d{3,4}',
+    r'\b(my name|call me|phone|reserve|reservation)\b',
+]
+
+FILLER_WORDS = {
+    "i", "want", "need", "show", "me", "looking", "for", "do", "you", "have", "can", "buy", "find",
+    "a", "an", "the", "some", "any", "pair", "pairs", "of", "shoes", "shoe", "sneakers", "in", "with",
+    "and", "please", "size", "eu", "taille", "under", "below", "less", "than", "max", "maximum",
+    "over", "above", "more", "min", "minimum", "between", "to", "dh", "mad", "dhs", "from", "up",
+    "men", "women", "man", "woman", "mens", "womens", "s", "is", "are", "there", "what",
+    "which", "brands", "categories", "colors", "colours", "sell", "recommend", "best", "top",
+    "rated", "popular", "suggest", "something", "good", "new", "cheap", "color", "colour",
+    "hi", "hello", "hey", "salam", "ok", "okay", "thanks", "my", "it", "would", "like",
+    "where", "i'll", "take", "these", "get",
+}
+
+# Stock questions and orderings are more than a search_shoes call, they go to the model
+AVAILABILITY_WORDS = {"available", "availability", "stock", "left", "sold"}
+SORT_WORDS = {"cheapest", "cheaper", "expensive", "priciest", "lowest", "highest", "sort", "sorted", "newest", "latest"}
+
+# Exclusions flip the meaning of the facets they come with ("nike, not white")
+NEGATION_PATTERN = re.compile(r"\b(?:not|no|except|without|other than|don't|dont|don’t|excluding)\b")
+# Up to this many words, a single word outside the lexicon is enough to leave the message to the model
+SHORT_MESSAGE_WORDS = 12
+
+SIZE_PATTERN = re.compile(r'\b(?:size|eu|taille)\s*(\d{1,2}(?:\.5)?)\b|\b(\d{2})\s*eu\b')
+PRICE_MAX_PATTERN = re.compile(r'\b(?:under|below|less than|max(?:imum)?|up to)\s*(\d{2,5})\b')
+PRICE_MIN_PATTERN = re.compile(r'\b(?:over|above|more than|min(?:imum)?|from)\s*(\d{2,5})\b')
+PRICE_RANGE_PATTERN = re.compile(r'\b(?:between\s*)?(\d{2,5})\s*(?:-|and|to)\s*(\d{2,5})\s*(?:dh|mad|dhs)\b')
+
+class IntentRouter:
+    """
+    Rule-based intent and slot extraction for simple shopping requests.
+    Messages like "show me white Nike size 42 under 800 DH" are mapped straight
+    onto a tool call so the tool-selection completion can be skipped; anything
+    the lexicon does not fully explain is left to the model.
+    """
+
+    def __init__(self, facet_cache, threshold=0.8):
+        self.facet_cache = facet_cache
+        self.threshold = threshold
+
+        self._lock = threading.Lock()
+        self.messages = 0
+        self.routed = {}
+        self.below_threshold = 0
+
+    def extract(self, message):
+        """Return (function_name, arguments, confidence) for a message, or None"""
+        text = (message or "").strip().lower()
+        if not text or text.startswith(FOLLOW_UP_STARTS):
+            return None
+        if any(re.search(pattern, text) for pattern in CONTACT_PATTERNS):
+            return None
+        if NEGATION_PATTERN.search(text):
+            return None
+
+        if any(cue in text for cue in CATALOG_CUES):
+            return "get_brands_and_categories", {}, 1.0
+
+        facets = self.facet_cache.get()
+        slots = match_facets(text, {
+            "brand": facets["brands"],
+            "category": facets["categories"],
+            "color": facets["colors"],
+            "gender": facets["genders"],
+        })
+        consumed = " ".join(slots.values())
+
+        arguments = {}
+        min_size, max_size = facets["size_range"]
+        size_match = SIZE_PATTERN.search(text)
+        if size_match:
+            size = float(size_match.group(1) or size_match.group(2))
+            if min_size is None or not (min_size <= size <= max_size):
+                # Probably a US/UK size, the model can ask what is meant
+                return None
+            arguments["size"] = int(size)
+            consumed += f" {(size_match.group(1) or size_match.group(2)).replace('.', ' ')}"
+
+        range_match = PRICE_RANGE_PATTERN.search(text)
+        if range_match:
+            low, high = sorted([float(range_match.group(1)), float(range_match.group(2))])
+            arguments["price_min"], arguments["price_max"] = low, high
+            consumed += f" {range_match.group(1)} {range_match.group(2)}"
+        else:
+            for key, pattern in [("price_max", PRICE_MAX_PATTERN), ("price_min", PRICE_MIN_PATTERN)]:
+                price_match = pattern.search(text)
+                if price_match:
+                    arguments[key] = float(price_match.group(1))
+                    consumed += f" {price_match.group(1)}"
+
+        # Confidence is the share of words explained by the lexicon
+        words = re.findall(r"[a-z0-9']+", text.replace("'s", ""))
+        consumed_words = set(consumed.split())
+
+        if AVAILABILITY_WORDS.intersection(words) or SORT_WORDS.intersection(words):
+            return None
+        if any(word.isdigit() and word not in consumed_words for word in words):
+            # Probably a model number ("Running 12"), the model has to find the product
+            return None
+        unknown = [word for word in words if word not in FILLER_WORDS and word not in consumed_words]
+        if unknown and len(words) <= SHORT_MESSAGE_WORDS:
+            # "black shoes for kids": the unknown word may be the one that matters
+            return None
+        confidence = 1 - len(unknown) / max(len(words), 1)
+
+        if any(cue in text for cue in RECOMMEND_CUES) and not arguments:
+            return "get_shoe_recommendations", {"preferences": message}, confidence
+
+        if not slots and not arguments:
+            return None
+        if "?" in text and not any(cue in text for cue in SEARCH_CUES):
+            confidence *= 0.8
+
+        arguments.update(slots)
+        return "search_shoes", arguments, round(confidence, 3)
+
+    def route(self, message):
+        """Return (function_name, arguments) when the message can skip the model's tool selection"""
+        extracted = self.extract(message)
+
+        with self._lock:
+            self.messages += 1
+            if extracted is None or extracted[2] < self.threshold:
+                if extracted is not None:
+                    self.below_threshold += 1
+                return None
+            self.routed[extracted[0]] = self.routed.get(extracted[0], 0) + 1
+
+        return extracted[0], extracted[1]
+
+    def stats(self):
+        with self._lock:
+            routed = sum(self.routed.values())
+            return {
+                "threshold": self.threshold,
+                "messages": self.messages,
+                "routed": dict(self.routed),
+                "below_threshold": self.below_threshold,
+                "hit_rate": round(routed / self.messages, 3) if self.messages else None,
+            }
@@ -0,0 +1,144 @@
+import re
+import time
+import bisect
+import threading
+from database.schema import CATALOG_PROJECTION, normalize_value, shoe_card
+
+def match_facets(text, facets):
+    """
+    Find the catalog facet values mentioned in free text.
+    `facets` maps a facet name to its known values; returns facet -> matched
+    value (normalized), preferring the longest value ("new balance" over "new").
+    """
+    words = " " + re.sub(r"[^a-z0-9]+", " ", normalize_value(text or "").replace("'s", "")) + " "
+    # "mens" / "womens" without the apostrophe
+    words = words.replace(" mens ", " men ").replace(" womens ", " women ")
+
+    matches = {}
+    for facet, values in facets.items():
+        for value in sorted(values, key=len, reverse=True):
+            value = normalize_value(value)
+            if value and f" {value} " in words:
+                matches[facet] = value
+                break
+    return matches
+
+class RecommendationLeaderboard:
+    """
+    Materialized top-rated in-stock shoes, kept sorted by rating (then price)
+    overall and per category, gender and category + gender, so recommendations
+    are a slice of a precomputed list. Individual shoe changes are applied in
+    place; a full rebuild happens when the catalog is invalidated or every `ttl`
+    seconds.
+    """
+
+    def __init__(self, db, min_rating=4.0, ttl=600):
+        self.db = db
+        self.min_rating = min_rating
+        self.ttl = ttl
+
+        self._boards = {}  # board key -> sorted list of (-rating, price, id)
+        self._shoes = {}   # id -> shoe document
+        self._built_at = None
+        self._lock = threading.Lock()
+
+        self.lookups = 0
+        self.rebuilds = 0
+        self.updates = 0
+        self.last_rebuild_ms = None
+
+    def _board_keys(self, shoe):
+        category = shoe.get("category_lc") or normalize_value(shoe.get("category", ""))
+        gender = shoe.get("gender_lc") or normalize_value(shoe.get("gender", ""))
+        return [("all",), ("category", category), ("gender", gender), ("category_gender", category, gender)]
+
+    def _is_eligible(self, shoe):
+        return bool(shoe.get("in_stock")) and (shoe.get("rating") or 0) >= self.min_rating
+
+    def _add(self, shoe):
+        shoe_id = shoe["_id"]
+        self._shoes[shoe_id] = shoe
+        entry = (-shoe["rating"], shoe.get("price") or 0, shoe_id)
+        for key in self._board_keys(shoe):
+            bisect.insort(self._boards.setdefault(key, []), entry)
+
+    def _remove(self, shoe_id):
+        shoe = self._shoes.pop(shoe_id, None)
+        if shoe is None:
+            return
+        entry = (-shoe["rating"], shoe.get("price") or 0, shoe_id)
+        for key in self._board_keys(shoe):
+            board = self._boards.get(key, [])
+            index = bisect.bisect_left(board, entry)
+            if index < len(board) and board[index] == entry:
+                del board[index]
+
+    def _rebuild(self):
+        started = time.perf_counter()
+        self._boards = {}
+        self._shoes = {}
+
+        for shoe in self.db.shoes.find({"in_stock": True, "rating": {"$gte": self.min_rating}}, CATALOG_PROJECTION):
+            shoe["_id"] = str(shoe["_id"])
+            self._add(shoe)
+
+        self._built_at = time.monotonic()
+        self.rebuilds += 1
+        self.last_rebuild_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def top(self, category=None, gender=None, brand=None, color=None, limit=8):
+        """Return the best rated in-stock shoes for the given preferences"""
+        with self._lock:
+            if self._built_at is None or time.monotonic() - self._built_at >= self.ttl:
+                self._rebuild()
+            self.lookups += 1
+
+            if category and gender:
+                key = ("category_gender", category, gender)
+            elif category:
+                key = ("category", category)
+            elif gender:
+                key = ("gender", gender)
+            else:
+                key = ("all",)
+
+            results = []
+            for _, _, shoe_id in self._boards.get(key, []):
+                shoe = self._shoes[shoe_id]
+                if brand and shoe.get("brand_lc") != brand:
+                    continue
+                if color and shoe.get("color_lc") != color:
+                    continue
+                results.append(shoe_card(shoe))
+                if len(results) >= limit:
+                    break
+            return results
+
+    def apply_change(self, version=None, change=None):
+        """
+        Catalog event subscriber: re-slot a changed shoe, or rebuild lazily
+        when the whole catalog may have changed.
+        """
+        with self._lock:
+            if change is None:
+                self._built_at = None
+                return
+            if self._built_at is None:
+                return
+
+            shoe_id = str(change["_id"])
+            self._remove(shoe_id)
+            if not change.get("_deleted") and self._is_eligible(change):
+                self._add({**change, "_id": shoe_id})
+            self.updates += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "shoes": len(self._shoes),
+                "boards": len(self._boards),
+                "lookups": self.lookups,
+                "rebuilds": self.rebuilds,
+                "incremental_updates": self.updates,
+                "last_rebuild_ms": self.last_rebuild_ms,
+            }
@@ -0,0 +1,216 @@
+import time
+import asyncio
+import threading
+import openai
+from collections import deque
+from rate_limiter import RateLimitExceeded
+
+# Relative price per token, gpt-4.1 = 1
+MODEL_COSTS = {
+    "openai/gpt-4.1": 1.0,
+    "openai/gpt-4.1-mini": 0.2,
+    "openai/gpt-4.1-nano": 0.05,
+    "openai/gpt-4o": 1.25,
+    "openai/gpt-4o-mini": 0.075,
+    "openai/o4-mini": 0.55,
+}
+
+class ModelStats:
+    """Rolling health figures for one model"""
+
+    def __init__(self, window=50):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+    def percentile(self, fraction):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+def retry_after_seconds(error, default=60.0):
+    """Seconds until a rate-limited model accepts requests again, from the 429 response headers"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for header in ["retry-after", "x-ratelimit-timeremaining", "x-ratelimit-reset-requests"]:
+        value = headers.get(header)
+        if value:
+            try:
+                return float(str(value).rstrip("s"))
+            except ValueError:
+                continue
+    return default
+
+def is_retryable(error):
+    """Whether another model may succeed: rate limits, timeouts, server and connection errors"""
+    if isinstance(error, openai.APIStatusError):
+        # Other 4xx (bad request, auth, content filter) fail the same way on every model
+        return error.status_code in (408, 429) or error.status_code >= 500
+    return isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, asyncio.TimeoutError))
+
+class ModelRouter:
+    """
+    Routes completions over the configured models by health.
+    Tracks latency percentiles, error rates and rate-limit reset times per
+    model, and retries a failed request on the next healthy model until the
+    deadline runs out, instead of switching every user to another model.
+
+    Policies: "priority" keeps the configured order, "latency" prefers the
+    fastest p50 and "cost" the cheapest model. With a `limiter`, a model whose
+    client-side quota is exhausted is skipped for the next one.
+    """
+
+    def __init__(self, models, policy="priority", costs=None, failure_threshold=3, failure_cooldown=30.0,
+                 limiter=None):
+        self.models = list(models)
+        self.policy = policy
+        self.limiter = limiter
+        self.costs = costs or MODEL_COSTS
+        self.failure_threshold = failure_threshold
+        self.failure_cooldown = failure_cooldown
+
+        self._stats = {model: ModelStats() for model in self.models}
+        self._lock = threading.Lock()
+
+    def _sort_key(self, model):
+        stats = self._stats[model]
+        order = self.models.index(model)
+        if self.policy == "latency":
+            # Unmeasured models are tried before slow ones so they get measured
+            return (stats.percentile(0.5) or 0.0, order)
+        if self.policy == "cost":
+            return (self.costs.get(model, 1.0), order)
+        return (order,)
+
+    def candidates(self):
+        """Models to try, healthy ones first in policy order"""
+        now = time.monotonic()
+        with self._lock:
+            healthy = [model for model in self.models if self._stats[model].cooldown_until <= now]
+            cooling = [model for model in self.models if self._stats[model].cooldown_until > now]
+            healthy.sort(key=self._sort_key)
+            cooling.sort(key=lambda model: self._stats[model].cooldown_until)
+        return healthy + cooling
+
+    def record_success(self, model, latency=None):
+        with self._lock:
+            stats = self._stats[model]
+            stats.requests += 1
+            if latency is not None:
+                stats.latencies.append(latency)
+            stats.outcomes.append(True)
+            stats.consecutive_failures = 0
+
+    def record_failure(self, model, error):
+        with self._lock:
+            stats = self._stats[model]
+            stats.requests += 1
+            stats.errors += 1
+            stats.outcomes.append(False)
+            stats.consecutive_failures += 1
+
+            if getattr(error, "status_code", None) == 429:
+                stats.cooldown_until = time.monotonic() + retry_after_seconds(error)
+            elif stats.consecutive_failures >= self.failure_threshold:
+                stats.cooldown_until = time.monotonic() + self.failure_cooldown
+
+        print(f"Error with model {model}: {error}. Trying the next model.")
+
+    def call(self, request, deadline=30.0, tokens=0, record_latency=True):
+        """
+        Run `request(model, timeout)` on the best available model, retrying on
+        the next one on failure until `deadline` seconds have passed.
+        `tokens` is the request's estimated size for the rate limiter. Streamed
+        requests pass `record_latency=False`, their call only opens the stream.
+        """
+        started = time.monotonic()
+        last_error = None
+
+        for model in self.candidates():
+            remaining = deadline - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+
+            if self.limiter is not None:
+                try:
+                    self.limiter.acquire(model, tokens, timeout=remaining)
+                except RateLimitExceeded as e:
+                    last_error = e
+                    continue
+                remaining = deadline - (time.monotonic() - started)
+
+            attempt_started = time.monotonic()
+            try:
+                result = request(model, remaining)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                self.record_failure(model, e)
+                last_error = e
+                continue
+
+            self.record_success(model, time.monotonic() - attempt_started if record_latency else None)
+            return result
+
+        raise last_error or TimeoutError("No model answered before the deadline")
+
+    async def acall(self, request, deadline=30.0, tokens=0, record_latency=True):
+        """Async variant of `call` for `request(model, timeout)` coroutines"""
+        started = time.monotonic()
+        last_error = None
+
+        for model in self.candidates():
+            remaining = deadline - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+
+            if self.limiter is not None:
+                try:
+                    await self.limiter.aacquire(model, tokens, timeout=remaining)
+                except RateLimitExceeded as e:
+                    last_error = e
+                    continue
+                remaining = deadline - (time.monotonic() - started)
+
+            attempt_started = time.monotonic()
+            try:
+                result = await asyncio.wait_for(request(model, remaining), remaining)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                self.record_failure(model, e)
+                last_error = e
+                continue
+
+            self.record_success(model, time.monotonic() - attempt_started if record_latency else None)
+            return result
+
+        raise last_error or TimeoutError("No model answered before the deadline")
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "policy": self.policy,
+                "rate_limiter": self.limiter.stats() if self.limiter is not None else None,
+                "models": {
+                    model: {
+                        "requests": stats.requests,
+                        "errors": stats.errors,
+                        "error_rate": round(stats.error_rate(), 3),
+                        "p50_ms": round(stats.percentile(0.5) * 1000) if stats.latencies else None,
+                        "p95_ms": round(stats.percentile(0.95) * 1000) if stats.latencies else None,
+                        "cooldown_seconds": max(0, round(stats.cooldown_until - now, 1)),
+                    }
+                    for model, stats in self._stats.items()
+                }
+            }
@@ -0,0 +1,118 @@
+import time
+import asyncio
+import threading
+
+class RateLimitExceeded(Exception):
+    """Raised when a request is shed instead of queued"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Token bucket refilled continuously at `per_minute` units per minute"""
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def reserve(self, amount, now):
+        """Take `amount` units, going into debt if needed; returns the seconds to wait"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= min(amount, self.capacity)
+        return max(0.0, -self.tokens / self.rate)
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` units would be available, without taking them"""
+        tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        deficit = min(amount, self.capacity) - tokens
+        return max(0.0, deficit / self.rate)
+
+class ModelRateLimiter:
+    """
+    Client-side requests/min and tokens/min limits per model, with a bounded
+    admission queue. Requests wait their turn locally for up to `max_wait`
+    seconds; when the queue is full or the wait would be longer, they are shed
+    with RateLimitExceeded instead of being sent to the endpoint to be throttled.
+    """
+
+    def __init__(self, requests_per_minute=10, tokens_per_minute=50000, max_queue=32, max_wait=10.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self._buckets = {}  # model -> (request bucket, token bucket)
+        self._waiting = {}
+        self._lock = threading.Lock()
+
+        self.admitted = 0
+        self.delayed = 0
+        self.shed = 0
+        self.total_wait = 0.0
+
+    def _reserve(self, model, tokens, timeout):
+        """Reserve capacity for one request; returns the delay before it may be sent"""
+        max_wait = self.max_wait if timeout is None else min(self.max_wait, timeout)
+
+        with self._lock:
+            if model not in self._buckets:
+                self._buckets[model] = (TokenBucket(self.requests_per_minute), TokenBucket(self.tokens_per_minute))
+            requests_bucket, tokens_bucket = self._buckets[model]
+
+            now = time.monotonic()
+            wait = max(requests_bucket.wait_time(1, now), tokens_bucket.wait_time(tokens, now))
+            waiting = self._waiting.get(model, 0)
+
+            if wait > max_wait or (wait > 0 and waiting >= self.max_queue):
+                self.shed += 1
+                raise RateLimitExceeded(f"Rate limit for {model} reached, retry in {wait:.1f}s", retry_after=wait)
+
+            requests_bucket.reserve(1, now)
+            tokens_bucket.reserve(tokens, now)
+
+            self.admitted += 1
+            if wait > 0:
+                self.delayed += 1
+                self.total_wait += wait
+                self._waiting[model] = waiting + 1
+            return wait
+
+    def _done_waiting(self, model):
+        with self._lock:
+            self._waiting[model] -= 1
+
+    def acquire(self, model, tokens=0, timeout=None):
+        """Block until a request to `model` may be sent, or raise RateLimitExceeded"""
+        wait = self._reserve(model, tokens, timeout)
+        if wait > 0:
+            try:
+                time.sleep(wait)
+            finally:
+                self._done_waiting(model)
+
+    async def aacquire(self, model, tokens=0, timeout=None):
+        """Async variant of `acquire`"""
+        wait = self._reserve(model, tokens, timeout)
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._done_waiting(model)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests_per_minute": self.requests_per_minute,
+                "tokens_per_minute": self.tokens_per_minute,
+                "max_queue": self.max_queue,
+                "max_wait": self.max_wait,
+                "admitted": self.admitted,
+                "delayed": self.delayed,
+                "shed": self.shed,
+                "waiting": sum(self._waiting.values()),
+                "avg_wait_ms": round(self.total_wait / self.delayed * 1000) if self.delayed else None,
+            }
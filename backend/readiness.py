@@ -0,0 +1,61 @@
+import time
+import threading
+
+class Readiness:
+    """
+    Dependency checks behind /api/ready, kept apart from /api/health which
+    only says the process is up. A background warm-up runs the checks until
+    they all pass, so the first requests do not pay for connecting, and the
+    time from import to the first all-green check is recorded.
+    """
+
+    def __init__(self, checks, started_at, target_seconds=5.0):
+        self.checks = checks  # name -> callable, raising when the dependency is not usable
+        self.started_at = started_at
+        self.target_seconds = target_seconds
+
+        self.ready_after = None
+        self._lock = threading.Lock()
+
+    def check(self):
+        """Run every check and return the readiness report"""
+        results = {}
+        for name, check in self.checks.items():
+            started = time.perf_counter()
+            try:
+                check()
+                results[name] = {"ok": True}
+            except Exception as e:
+                results[name] = {"ok": False, "error": str(e)}
+            results[name]["ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+        ready = all(result["ok"] for result in results.values())
+        with self._lock:
+            if ready and self.ready_after is None:
+                self.ready_after = time.monotonic() - self.started_at
+                print(f"✅ Ready {self.ready_after:.2f}s after import")
+
+        return {"ready": ready, "checks": results, **self.stats()}
+
+    def warm_up(self, on_ready=None, interval=1.0, max_interval=30.0):
+        """Check in a daemon thread until ready, backing off between attempts, then run `on_ready`"""
+        def run():
+            delay = interval
+            while not self.check()["ready"]:
+                time.sleep(delay)
+                delay = min(delay * 2, max_interval)
+
+            if on_ready is not None:
+                try:
+                    on_ready()
+                except Exception as e:
+                    print(f"❌ Warm-up failed: {e}")
+
+        threading.Thread(target=run, name="warm-up", daemon=True).start()
+
+    def stats(self):
+        return {
+            "import_to_ready_ms": round(self.ready_after * 1000) if self.ready_after is not None else None,
+            "target_ms": round(self.target_seconds * 1000),
+            "within_target": self.ready_after <= self.target_seconds if self.ready_after is not None else None,
+        }
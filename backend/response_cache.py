@@ -0,0 +1,101 @@
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+def normalize_text(text):
+    """Case and whitespace insensitive form of a message, for cache keys"""
+    return re.sub(r"\s+", " ", (text or "").strip().lower()).rstrip(".!")
+
+def fingerprint(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+class ResponseCache:
+    """
+    LRU cache of model replies for prompts that many sessions share, like
+    first-turn openers. Keys are built from the system prompt hash, the
+    normalized history (without tool call ids), the tools schema hash and the
+    models, so any change to those misses. Entries expire after `ttl` seconds
+    and the whole cache is dropped when the catalog changes.
+    """
+
+    def __init__(self, max_entries=512, ttl=600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._entries = OrderedDict()  # key -> (stored_at, message)
+        self._lock = threading.Lock()
+        self._tools_hashes = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _tools_hash(self, tools):
+        # The schema is a module-level constant, hash it once
+        tools_hash = self._tools_hashes.get(id(tools))
+        if tools_hash is None:
+            tools_hash = self._tools_hashes[id(tools)] = fingerprint(tools)
+        return tools_hash
+
+    def key(self, kind, messages, tools=None, models=()):
+        """Cache key for a completion request over `messages`"""
+        history = []
+        for message in messages[1:]:
+            entry = [message.get("role"), normalize_text(message.get("content"))]
+            for tool_call in message.get("tool_calls") or []:
+                entry.append([tool_call["function"]["name"], tool_call["function"]["arguments"]])
+            history.append(entry)
+
+        return fingerprint([
+            kind,
+            fingerprint(messages[0].get("content")),
+            history,
+            self._tools_hash(tools) if tools else None,
+            list(models),
+        ])
+
+    def get(self, key):
+        """Return the cached assistant message for `key`, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] >= self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, message):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), message)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, version=None, change=None):
+        """Drop every entry, replies may quote the old catalog (catalog event subscriber)"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "ttl": self.ttl,
+                "max_entries": self.max_entries,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,22 @@
+from response_cache import ResponseCache
+
+def canonical_filter(value):
+    """Hashable, order-independent form of a MongoDB filter"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, canonical_filter(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(canonical_filter(item) for item in value)
+    if isinstance(value, float) and value.is_integer():
+        # 800 and 800.0 are the same price band
+        return int(value)
+    return value
+
+class SearchCache(ResponseCache):
+    """
+    LRU cache of `search_shoes` results keyed on the canonical filter and the
+    catalog version, so the same popular search from different customers is
+    run against MongoDB once per catalog version (or once per `ttl` seconds).
+    """
+
+    def key(self, query_filter, version, limit=None, cursor=None, sort=None):
+        return (version, limit, sort, cursor, canonical_filter(query_filter))
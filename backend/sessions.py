@@ -0,0 +1,231 @@
+import json
+import time
+import zlib
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from bson.binary import Binary
+
+def estimate_session_size(session):
+    """Roughly estimate the memory held by a session's conversation, in bytes"""
+    size = 0
+    for message in session["conversation_history"]:
+        # Fixed overhead for the message dict itself
+        size += 200
+        size += len(message.get("content") or "")
+        for tool_call in message.get("tool_calls") or []:
+            size += 200 + len(tool_call["function"]["arguments"] or "")
+    return size
+
+def encode_history(conversation_history):
+    """
+    Serialize a conversation compactly for external storage.
+    The system prompt is the same for every session so it is left out and
+    restored on load; empty fields are dropped and the JSON is compressed.
+    """
+    messages = [
+        {key: value for key, value in message.items() if value is not None}
+        for message in conversation_history
+        if message.get("role") != "system"
+    ]
+    raw = json.dumps(messages, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return zlib.compress(raw, 6), len(raw)
+
+def decode_history(blob, system_message):
+    """Restore a conversation serialized with `encode_history`"""
+    return [system_message] + json.loads(zlib.decompress(blob).decode("utf-8"))
+
+class SessionBackend(ABC):
+    """Interface for the place customer sessions are kept between turns"""
+
+    @abstractmethod
+    def get(self, session_id):
+        """Get the session for `session_id`, creating a fresh one on a miss"""
+
+    @abstractmethod
+    def save(self, session_id, session):
+        """Persist a session once a turn has completed"""
+
+    @abstractmethod
+    def delete(self, session_id):
+        """Forget a session"""
+
+    @abstractmethod
+    def stats(self):
+        """Return counters describing the backend's usage"""
+
+class InMemorySessionBackend(SessionBackend):
+    """
+    In-process customer session store with LRU and idle-TTL eviction.
+    Sessions are evicted once idle for `idle_ttl` seconds, or least recently
+    used first when the store holds more than `max_sessions` sessions or
+    more than `max_bytes` of estimated conversation history.
+    """
+
+    def __init__(self, new_session, max_sessions=1000, idle_ttl=1800, max_bytes=64 * 1024 * 1024):
+        self.new_session = new_session
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+
+        self._sessions = OrderedDict()  # session_id -> (session, size, last_access)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = {"ttl": 0, "lru": 0, "memory": 0}
+
+    def get(self, session_id):
+        with self._lock:
+            now = time.monotonic()
+            self._evict_expired(now)
+
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                self.hits += 1
+                session, size, _ = entry
+                self._sessions[session_id] = (session, size, now)
+                self._sessions.move_to_end(session_id)
+                return session
+
+            self.misses += 1
+            session = self.new_session()
+            size = estimate_session_size(session)
+            self._sessions[session_id] = (session, size, now)
+            self._total_bytes += size
+            self._evict_over_capacity(keep=session_id)
+            return session
+
+    def save(self, session_id, session):
+        # Sessions are mutated in place, only the size bookkeeping needs updating
+        with self._lock:
+            size = estimate_session_size(session)
+            previous = self._sessions.pop(session_id, None)
+            if previous is not None:
+                self._total_bytes -= previous[1]
+
+            self._sessions[session_id] = (session, size, time.monotonic())
+            self._total_bytes += size
+            self._evict_over_capacity(keep=session_id)
+
+    def delete(self, session_id):
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is not None:
+                self._total_bytes -= entry[1]
+
+    def _evict_expired(self, now):
+        # Entries are kept in access order, so expired sessions sit at the front
+        while self._sessions:
+            session_id, (_, size, last_access) = next(iter(self._sessions.items()))
+            if now - last_access < self.idle_ttl:
+                break
+            self._sessions.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions["ttl"] += 1
+
+    def _evict_over_capacity(self, keep):
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions or self._total_bytes > self.max_bytes
+        ):
+            reason = "lru" if len(self._sessions) > self.max_sessions else "memory"
+            session_id = next(iter(self._sessions))
+            if session_id == keep:
+                self._sessions.move_to_end(keep)
+                session_id = next(iter(self._sessions))
+            _, size, _ = self._sessions.pop(session_id)
+            self._total_bytes -= size
+            self.evictions[reason] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "estimated_bytes": self._total_bytes,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "idle_ttl": self.idle_ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": dict(self.evictions),
+            }
+
+class MongoSessionBackend(SessionBackend):
+    """
+    Customer sessions stored in MongoDB so every worker and replica sees the
+    same conversations. Sessions expire through a TTL index on `updated_at`.
+    """
+
+    def __init__(self, new_session, collection, idle_ttl=1800):
+        self.new_session = new_session
+        self.collection = collection
+        self.idle_ttl = idle_ttl
+        self._indexes_ready = False
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saves = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    def _ensure_indexes(self):
+        if not self._indexes_ready:
+            self.collection.create_index("updated_at", expireAfterSeconds=self.idle_ttl)
+            self._indexes_ready = True
+
+    def get(self, session_id):
+        self._ensure_indexes()
+        document = self.collection.find_one({
+            "_id": session_id,
+            "updated_at": {"$gt": datetime.utcnow() - timedelta(seconds=self.idle_ttl)}
+        })
+
+        with self._lock:
+            if document is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        session = self.new_session()
+        if document is not None:
+            system_message = session["conversation_history"][0]
+            session["conversation_history"] = decode_history(document["history"], system_message)
+            session.update(document["state"])
+        return session
+
+    def save(self, session_id, session):
+        blob, raw_size = encode_history(session["conversation_history"])
+        state = {key: value for key, value in session.items() if key != "conversation_history"}
+
+        self.collection.update_one(
+            {"_id": session_id},
+            {"$set": {"history": Binary(blob), "state": state, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+        with self._lock:
+            self.saves += 1
+            self.raw_bytes += raw_size
+            self.stored_bytes += len(blob)
+
+    def delete(self, session_id):
+        self.collection.delete_one({"_id": session_id})
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "mongo",
+                "idle_ttl": self.idle_ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+                "saves": self.saves,
+                "compression_ratio": round(self.stored_bytes / self.raw_bytes, 3) if self.raw_bytes else None,
+            }
@@ -4,9 +4,12 @@ import requests
 from datetime import datetime
 from dotenv import load_dotenv
 from openai import OpenAI
-from pymongo import MongoClient
 from typing import List, Dict, Any
 import re
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from database.connection import get_database
 
 load_dotenv()
 
@@ -22,15 +25,7 @@ client = OpenAI(
 
 # MongoDB Configuration
 def get_db_connection():
-    mongo_client = MongoClient(os.getenv("CONNECTION_STRING"))
-    try:
-        mongo_client.admin.command('ping')
-        print("✅ Connected to MongoDB successfully!")
-    except Exception as e:
-        raise Exception(f"❌ Could not connect to MongoDB: {e}")
-    
-    db_name = os.getenv("DB_NAME")
-    return mongo_client[db_name]
+    return get_database(check=True)
 
 # Database instance
 db = get_db_connection()
@@ -0,0 +1,153 @@
+"""
+Benchmark: search_shoes-style queries on the in-process catalog engine.
+
+Compares CatalogEngine snapshots with a plain scan over the documents
+returning the same best rated matches and, with --mongo, with the indexed
+MongoDB queries search_shoes runs today (a scratch `shoes_bench` collection
+is created and dropped).
+
+Run from the backend directory: python tests/bench_catalog_engine.py [--mongo] [--sizes 1000,100000,1000000]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import timeit
+import heapq
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog_engine import CatalogSnapshot
+from catalog_pages import find_page
+from database.schema import normalize_shoe, ensure_shoe_indexes
+
+QUERIES = [
+    {"brand": "Nike"},
+    {"brand": "Adidas", "color": "White", "size": 42},
+    {"category": "Running", "gender": "Women", "price_max": 700},
+    {"brand": "Puma", "category": "Casual", "price_min": 500, "price_max": 800, "size": 40},
+    {"min_rating": 4.5, "price_max": 600},
+]
+
+def generate_shoes(count):
+    brands = ["Nike", "Adidas", "Puma", "Reebok", "New Balance"]
+    categories = ["Running", "Basketball", "Casual", "Training"]
+    colors = ["Black", "White", "Red", "Blue", "Gray"]
+    shoes = []
+    for i in range(count):
+        brand = random.choice(brands)
+        category = random.choice(categories)
+        shoes.append(normalize_shoe({
+            "_id": str(ObjectId()),
+            "name": f"{brand} {category} {i+1}",
+            "brand": brand,
+            "category": category,
+            "price": round(random.uniform(400, 1000), 2),
+            "color": random.choice(colors),
+            "sizes": random.sample(range(36, 48), random.randint(3, 5)),
+            "gender": random.choice(["Men", "Women", "Unisex"]),
+            "rating": round(random.uniform(3.5, 5.0), 1),
+            "in_stock": random.random() > 0.1,
+        }))
+    return shoes
+
+def scan(shoes, brand=None, category=None, color=None, gender=None, size=None,
+         price_min=None, price_max=None, min_rating=None, limit=10):
+    """Linear filter over the documents keeping the best rated matches, the naive in-memory baseline"""
+    results = []
+    for shoe in shoes:
+        if not shoe["in_stock"]:
+            continue
+        if brand and shoe["brand_lc"] != brand.lower():
+            continue
+        if category and shoe["category_lc"] != category.lower():
+            continue
+        if color and shoe["color_lc"] != color.lower():
+            continue
+        if gender and shoe["gender_lc"] != gender.lower():
+            continue
+        if size and size not in shoe["sizes"]:
+            continue
+        if price_min is not None and shoe["price"] < price_min:
+            continue
+        if price_max is not None and shoe["price"] > price_max:
+            continue
+        if min_rating is not None and shoe["rating"] < min_rating:
+            continue
+        results.append(shoe)
+    return heapq.nsmallest(limit, results, key=lambda shoe: (-shoe["rating"], shoe["price"]))
+
+def mongo_filter(brand=None, category=None, color=None, gender=None, size=None,
+                 price_min=None, price_max=None, min_rating=None):
+    """The filter search_shoes builds"""
+    query_filter = {"in_stock": True}
+    for field, value in (("brand", brand), ("category", category), ("color", color), ("gender", gender)):
+        if value:
+            query_filter[f"{field}_lc"] = value.lower()
+    if size:
+        query_filter["sizes"] = size
+    if price_min is not None or price_max is not None:
+        query_filter["price"] = {}
+        if price_min is not None:
+            query_filter["price"]["$gte"] = price_min
+        if price_max is not None:
+            query_filter["price"]["$lte"] = price_max
+    if min_rating is not None:
+        query_filter["rating"] = {"$gte": min_rating}
+    return query_filter
+
+def best_of(function, number):
+    return min(timeit.repeat(function, number=number, repeat=3)) / number
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--mongo", action="store_true", help="also time the MongoDB queries")
+    args = parser.parse_args()
+
+    collection = None
+    if args.mongo:
+        from database.connection import get_database
+        collection = get_database(check=True).shoes_bench
+
+    print(f"{'products':>9} {'build':>9} {'engine':>11} {'scan':>11} {'mongo':>11}   (avg per query)")
+    for count in [int(size) for size in args.sizes.split(",")]:
+        shoes = generate_shoes(count)
+
+        started = time.perf_counter()
+        snapshot = CatalogSnapshot(list(shoes))
+        build = time.perf_counter() - started
+
+        def engine_queries():
+            for query in QUERIES:
+                snapshot.page(snapshot.filter(**query), 10)
+
+        def scan_queries():
+            for query in QUERIES:
+                scan(shoes, **query)
+
+        number = max(1, 2000 // max(1, count // 100))
+        engine = best_of(engine_queries, number) / len(QUERIES)
+        naive = best_of(scan_queries, max(1, number // 10)) / len(QUERIES)
+
+        mongo = None
+        if collection is not None:
+            collection.drop()
+            for start in range(0, count, 10000):
+                collection.insert_many([{k: v for k, v in shoe.items() if k != "_id"} for shoe in shoes[start:start + 10000]])
+            ensure_shoe_indexes(collection)
+
+            def mongo_queries():
+                for query in QUERIES:
+                    find_page(collection, mongo_filter(**query), 10)
+
+            mongo = best_of(mongo_queries, 5) / len(QUERIES)
+            collection.drop()
+
+        mongo_text = f"{mongo * 1000:>8.2f} ms" if mongo is not None else f"{'-':>11}"
+        print(f"{count:>9} {build:>7.2f} s {engine * 1000:>8.3f} ms {naive * 1000:>8.3f} ms {mongo_text}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Micro-benchmark: cost of handing a search_shoes result from the tool to chat().
+
+Compares the old path (tool json.dumps the full result, chat() json.loads it to
+extract the shoes, then builds the model digest) with ToolResult, which keeps
+the documents as objects and only serializes the digest for the tool message.
+
+Run from the backend directory: python tests/bench_tool_results.py
+"""
+import os
+import sys
+import json
+import random
+import timeit
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tool_results import ToolResult, shoes_digest
+
+def generate_shoes(count):
+    brands = ["Nike", "Adidas", "Puma", "Reebok", "New Balance"]
+    categories = ["Running", "Basketball", "Casual", "Training"]
+    colors = ["Black", "White", "Red", "Blue", "Gray"]
+    shoes = []
+    for i in range(count):
+        brand = random.choice(brands)
+        category = random.choice(categories)
+        shoes.append({
+            "_id": str(ObjectId()),
+            "name": f"{brand} {category} {i+1}",
+            "brand": brand,
+            "category": category,
+            "price": round(random.uniform(400, 1000), 2),
+            "color": random.choice(colors),
+            "sizes": random.sample(range(36, 48), random.randint(3, 5)),
+            "gender": random.choice(["Men", "Women", "Unisex"]),
+            "rating": round(random.uniform(3.5, 5.0), 1),
+            "in_stock": True,
+            "image": "https://assets.adidas.com/images/w_1880,f_auto,q_auto/10d27f0989844a15bdae4946ff002c65_9366/JI2307_04_standard.jpg"
+        })
+    return shoes
+
+def json_round_trip(shoes):
+    """Tool returns a JSON string, chat() parses it back and re-encodes a digest"""
+    function_response = json.dumps({
+        "found_shoes": len(shoes),
+        "shoes": shoes,
+        "message": f"Found {len(shoes)} shoes matching your criteria!"
+    })
+    parsed_response = json.loads(function_response)
+    shoes_data = parsed_response.pop("shoes")
+    parsed_response["results"] = shoes_digest(shoes_data)
+    return json.dumps(parsed_response, separators=(",", ":")), shoes_data
+
+def structured_result(shoes):
+    """Tool returns a ToolResult, only the digest is serialized"""
+    result = ToolResult({
+        "found_shoes": len(shoes),
+        "message": f"Found {len(shoes)} shoes matching your criteria!"
+    }, shoes=shoes)
+    return result.content, result.shoes
+
+def main():
+    print(f"{'results':>8} {'json round-trip':>18} {'ToolResult':>14} {'saved':>12}")
+    for count in [10, 100, 1000]:
+        shoes = generate_shoes(count)
+        number = max(10, 20000 // count)
+        old = min(timeit.repeat(lambda: json_round_trip(shoes), number=number, repeat=5)) / number
+        new = min(timeit.repeat(lambda: structured_result(shoes), number=number, repeat=5)) / number
+        print(f"{count:>8} {old * 1e6:>15.1f} µs {new * 1e6:>11.1f} µs {(old - new) * 1e6:>9.1f} µs")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import json
+
+def shoes_digest(shoes):
+    """Summarize shoe documents into the few facts the model needs to talk about them"""
+    if not shoes:
+        return {"count": 0}
+
+    prices = [shoe["price"] for shoe in shoes if shoe.get("price") is not None]
+    return {
+        "count": len(shoes),
+        "brands": sorted({shoe["brand"] for shoe in shoes if shoe.get("brand")}),
+        "categories": sorted({shoe["category"] for shoe in shoes if shoe.get("category")}),
+        "colors": sorted({shoe["color"] for shoe in shoes if shoe.get("color")}),
+        "price_range": [min(prices), max(prices)] if prices else None,
+        "ids": [shoe["_id"] for shoe in shoes if shoe.get("_id")],
+    }
+
+class ToolResult:
+    """
+    Structured result of a tool call.
+    `data` holds the tool's fields and `shoes` the documents displayed by the
+    frontend. The JSON sent back to the model is only built when `content`
+    is read, with the shoes replaced by a digest.
+    """
+
+    __slots__ = ("data", "shoes", "_content")
+
+    def __init__(self, data, shoes=None):
+        self.data = data
+        self.shoes = shoes
+        self._content = None
+
+    @property
+    def content(self):
+        """Content of the `role: tool` message for the model"""
+        if self._content is None:
+            payload = dict(self.data)
+            if self.shoes is not None:
+                payload["results"] = shoes_digest(self.shoes)
+            self._content = json.dumps(payload, separators=(",", ":"), default=str)
+        return self._content